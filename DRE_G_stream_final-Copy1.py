@@ -1,11 +1,14 @@
 import pandas as pd
-import plotly.express as px
 import streamlit as st
-import plotly.graph_objects as go 
-from plotly.subplots import make_subplots
-from janitor import clean_names, remove_empty
 import re
-import plotly.subplots as sp
+from dre.calculos import calc_metricas as metricas_colunas, limpa_nomes, remove_vazias
+from dre.formatos import estilo, formata_numero
+from dre.importacao import preguicoso
+
+# plotly so e importado quando a aba escolhida monta o primeiro grafico
+px = preguicoso('plotly.express')
+go = preguicoso('plotly.graph_objects')
+sp = preguicoso('plotly.subplots')
 
 # Funcao troca sinal do df qdo negativo para mostrar linhas acima do eixo X usada de forma local de acordo com o df
 def troca_sinal(dataframe, colunas):
@@ -32,13 +35,14 @@ def linhas_paral(dataframe, colunas):
 # Funcao calcula metricas Melhor:max, Pior:min, Media:mean e STD:std das colunas especificadas do dataframe
 def calc_metricas(dataframe, colunas):
     '''
-    Funcao retorna dataframe das metricas Melhor:max, Pior:min, Media:mean e STD:std das colunas.
+    Funcao mostra no Streamlit as metricas Melhor:max, Pior:min, Media:mean e STD:std de cada coluna.
     input: dataframe e lista de colunas
-    output: dataframe
+    output: st.dataframe com uma tabela por coluna
     '''
+    metricas = metricas_colunas(dataframe, colunas)
     for i in colunas:
-        print(f'Metricas: {i}')
-        display(pd.DataFrame({'Melhor' : [f'{dataframe[i].max():,.2f}'], 'Pior' : [f'{dataframe[i].min():,.2f}'], 'Media' : [f'{dataframe[i].mean():,.2f}'], 'STD' : [f'{dataframe[i].std():,.2f}']}, index=['']))
+        st.markdown(f'###### Metricas: {i}')
+        st.dataframe(estilo(metricas.loc[[i]]))
 
 # Funcao cria colunas de percentual dos elementos da coluna em relacao ao proprio total
 def calc_perc(data, coluna):
@@ -62,9 +66,9 @@ def gera_medidas (lista_titulo, lista_coluna, lista_cols):
                 st.markdown(f'###### {titulo}')
                 valor = df_perc[coluna].sum()
                 percentual = valor / df_perc['Receita Operacional Bruta'].sum()
-                # Correcao da formatacao de numeros casa decimal e milhar
-                st.markdown(f"#### {valor:,.2f}".replace(',', ';').replace('.', ',').replace(';', '.'))
-                st.markdown(f"##### :green[{percentual:.2%}]".replace('.', ','))
+                # Formatacao brasileira de casa decimal e milhar
+                st.markdown(f"#### {formata_numero(valor)}")
+                st.markdown(f"##### :green[{formata_numero(percentual, percentual=True)}]")
 
 #===============
 # Carregando dados
@@ -110,14 +114,14 @@ with tab1:
 
     # exibindo df transposto, correcao de virgulas e pontos decimais, destaque do valor minimo
     
-    st.dataframe(df_perc.set_index('Mes').T.style.format(precision=2, decimal=',', thousands='.').highlight_min(color='red'), 
+    st.dataframe(estilo(df_perc.set_index('Mes').T, percentuais=[]).highlight_min(color='red'), 
                  use_container_width=True)
 
 
     #st.metric(label='Receita Operacional Bruta', value=f"{df_perc['Receita Operacional Bruta'].sum():,.2f}")
     # total_ROB = f"{df_perc:,.3f}".replace(',', ';').replace('.', ',').replace(';', '.')
     # st.markdown(f"#### Consolidado Receita Operacional Bruta (ROB): " + total_ROB)
-    st.markdown(f"### Consolidado Receita Operacional Bruta (ROB): {df_perc['Receita Operacional Bruta'].sum():,.2f}".replace(',', ';').replace('.', ',').replace(';', '.'))
+    st.markdown(f"### Consolidado Receita Operacional Bruta (ROB): {formata_numero(df_perc['Receita Operacional Bruta'].sum())}")
 
     st.write('---')
     
@@ -292,7 +296,7 @@ with tab5:
 #------------------ EBITDA -------------------------------------------------------------------------------------------------------------
         
 with tab6:
-    df_ebitda = (df_meses_selecionados.iloc[:,36:137].pipe(clean_names).pipe(remove_empty))
+    df_ebitda = (df_meses_selecionados.iloc[:,36:137].pipe(limpa_nomes).pipe(remove_vazias))
     
     # Removendo colunas zeradas
 
@@ -320,7 +324,7 @@ with tab6:
     min_ebitda = df_ebitda['ebitda'].min()
     std_ebitda = df_ebitda['ebitda'].std()
 
-    st.write((pd.DataFrame({'Melhor' : [f'{max_ebitda:,.2f}'], 'Pior' : [f'{min_ebitda:,.2f}'], 'Media' : [f'{media_ebitda:,.2f}'], 'STD' : [f'{std_ebitda:,.2f}']}, index=[''])))
+    st.write(estilo(pd.DataFrame({'Melhor' : [max_ebitda], 'Pior' : [min_ebitda], 'Media' : [media_ebitda], 'STD' : [std_ebitda]}, index=[''])))
 
 
     # Criar figura
@@ -394,7 +398,7 @@ with tab6:
                     
 with tab7:    
      
-    df_res_op = (df_meses_selecionados.iloc[:,138:165].pipe(clean_names).pipe(remove_empty))
+    df_res_op = (df_meses_selecionados.iloc[:,138:165].pipe(limpa_nomes).pipe(remove_vazias))
     
      # Removendo colunas zeradas
 
@@ -417,7 +421,7 @@ with tab7:
     min_df_res_op = df_res_op['resultado_operacional'].min()
     std_df_res_op = df_res_op['resultado_operacional'].std()
 
-    st.write((pd.DataFrame({'Melhor' : [f'{max_df_res_op:,.2f}'], 'Pior' : [f'{min_df_res_op:,.2f}'], 'Media' : [f'{media_df_res_op:,.2f}'], 'STD' : [f'{std_df_res_op:,.2f}']}, index=[''])))
+    st.write(estilo(pd.DataFrame({'Melhor' : [max_df_res_op], 'Pior' : [min_df_res_op], 'Media' : [media_df_res_op], 'STD' : [std_df_res_op]}, index=[''])))
     
     #st.markdown('##### Resultado Operacional:')
     #st.markdown(' Res. Finan. Liquido + Desp. Finan. + Depreciacao + Receitas/Desp Nao Operacionais')
@@ -434,7 +438,7 @@ with tab7:
 
 with tab8:
             
-    df_rai = (df_meses_selecionados.iloc[:,[136,137,138,167]].pipe(clean_names).pipe(remove_empty))
+    df_rai = (df_meses_selecionados.iloc[:,[136,137,138,167]].pipe(limpa_nomes).pipe(remove_vazias))
     
     # Removendo colunas zeradas
     df_rai = df_rai[~(df_rai == 0).all(axis=1)]
@@ -456,7 +460,7 @@ with tab8:
     min_df_rai = df_rai['resultado_operacional'].min()
     std_df_rai = df_rai['resultado_operacional'].std()
 
-    st.write((pd.DataFrame({'Melhor' : [f'{max_df_rai:,.2f}'], 'Pior' : [f'{min_df_rai:,.2f}'], 'Media' : [f'{media_df_rai:,.2f}'], 'STD' : [f'{std_df_rai:,.2f}']}, index=[''])))
+    st.write(estilo(pd.DataFrame({'Melhor' : [max_df_rai], 'Pior' : [min_df_rai], 'Media' : [media_df_rai], 'STD' : [std_df_rai]}, index=[''])))
     
     lista_rai = ['ebitda','despesa_com_escritorio','resultado_operacional','resultado_antes_do_imposto']
     
@@ -482,7 +486,7 @@ with tab8:
 with tab9:
     st.write('Resultado Operacional do Periodo')
     
-    df_rgp = (df_meses_selecionados.iloc[:,[167,168,171]].pipe(clean_names).pipe(remove_empty))
+    df_rgp = (df_meses_selecionados.iloc[:,[167,168,171]].pipe(limpa_nomes).pipe(remove_vazias))
 
     
     # Removendo colunas zeradas
@@ -505,7 +509,7 @@ with tab9:
     min_rgp = df_rgp['resultado_antes_do_imposto'].min()
     std_rgp = df_rgp['resultado_antes_do_imposto'].std()
 
-    st.write((pd.DataFrame({'Melhor' : [f'{max_rgp:,.2f}'], 'Pior' : [f'{min_rgp:,.2f}'], 'Media' : [f'{media_rgp:,.2f}'], 'STD' : [f'{std_rgp:,.2f}']}, index=[''])))
+    st.write(estilo(pd.DataFrame({'Melhor' : [max_rgp], 'Pior' : [min_rgp], 'Media' : [media_rgp], 'STD' : [std_rgp]}, index=[''])))
 
         # Criar figura
     fig_rgp = go.Figure()
@@ -0,0 +1,248 @@
+'''
+Benchmark de escala da DRE com dados sinteticos (benchmarks/gerador.py): para cada escala N contas x M meses x K entidades
+mede a carga das planilhas (openpyxl e parquet auxiliar), a conferencia da hierarquia, a derivacao dos frames das secoes,
+as metricas (e o ganho incremental ao ligar um mes), as variacoes de todas as entidades, a montagem das figuras
+e a serializacao das tabelas (Arrow) e figuras (JSON) enviadas ao navegador.
+Os tempos (melhor de R repeticoes) sao comparados com o baseline salvo; etapa acima do limite conta como regressao.
+
+Uso: python benchmarks/bench_escala.py [--escalas 171x12x1,500x24x5] [--repeticoes 5] [--limite 0.5] [--salva]
+     saida 1 quando alguma etapa regrediu (para uso em CI)
+'''
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+import plotly.io as pio
+
+import gerador
+from bench_graficos import figuras_fabrica
+from dre import carga, derivados, graficos
+from dre.base import BaseDRE
+from dre.carga import MESES, caminho_auxiliar
+from dre.derivados import CALCULOS, deriva_frames
+from dre.integridade import confere
+from dre.variacoes import calcula_variacoes
+
+# Dependencia opcional: sem pyarrow a serializacao das tabelas nao e medida
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline_escala.json')
+ESCALAS = '171x12x1,500x24x5,1000x36x20'
+SELECOES = [['Jan', 'Fev', 'Mar'], ['Abr', 'Mai', 'Jun'], MESES[:6], MESES]
+# Regressao = etapa mais lenta que o baseline alem do limite relativo e da folga absoluta (ruido de etapas curtas)
+LIMITE = 0.5
+FOLGA_MS = 2.0
+
+
+def le_escala(texto):
+    # '500x24x5' -> (500, 24, 5): contas x meses x entidades
+    n_contas, n_meses, n_entidades = (int(parte) for parte in texto.lower().split('x'))
+    return n_contas, n_meses, n_entidades
+
+
+def cronometra(etapa, repeticoes, prepara=None):
+    '''
+    Funcao mede o melhor tempo de varias repeticoes de uma etapa; prepara roda antes de cada uma, fora do tempo (ex: limpar caches).
+    input: funcao da etapa, repeticoes e funcao de preparo
+    output: tempo em milissegundos
+    '''
+    tempos = []
+    for _ in range(repeticoes):
+        if prepara is not None:
+            prepara()
+        inicio = time.perf_counter()
+        etapa()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return min(tempos)
+
+
+def calibra(repeticoes):
+    '''
+    Funcao mede uma carga fixa de pandas/numpy, guardada junto do baseline: os tempos sao comparados
+    na proporcao da velocidade da maquina (baseline gravado em outra maquina ou maquina mais carregada).
+    input: repeticoes
+    output: tempo em milissegundos
+    '''
+    gerador_aleatorio = np.random.default_rng(0)
+    df = pd.DataFrame(gerador_aleatorio.normal(size=(2000, 200)))
+
+    def carga_fixa():
+        df.T.reset_index().groupby(df.T.index % 12).sum()
+        (df / df.sum()).agg(['max', 'min', 'mean', 'std'])
+        df.to_numpy().cumsum(axis=0)
+
+    return cronometra(carga_fixa, max(repeticoes, 5))
+
+
+def _limpa_carga(planilhas, auxiliar):
+    carga._cache.clear()
+    for caminho, _, _, aba in planilhas:
+        if not auxiliar and os.path.exists(caminho_auxiliar(caminho, aba)):
+            os.remove(caminho_auxiliar(caminho, aba))
+
+
+def mede_escala(n_contas, n_meses, n_entidades, repeticoes, planilhas=True):
+    '''
+    Funcao gera os dados da escala e mede cada etapa do pipeline.
+    input: numero de contas, meses e entidades, repeticoes e planilhas (False pula a carga, que grava xlsx)
+    output: dicionario {etapa: milissegundos}
+    '''
+    dres = gerador.gera_dres(n_contas, n_meses, n_entidades)
+    resultado = {}
+
+    if planilhas:
+        diretorio = tempfile.mkdtemp(prefix='dre_bench_')
+        try:
+            lista = gerador.grava_planilhas(diretorio, dres)
+            resultado['carga_planilhas'] = cronometra(lambda: BaseDRE.de_planilhas(lista), repeticoes, lambda: _limpa_carga(lista, False))
+            resultado['carga_parquet'] = cronometra(lambda: BaseDRE.de_planilhas(lista), repeticoes, lambda: _limpa_carga(lista, True))
+        finally:
+            carga._cache.clear()
+            shutil.rmtree(diretorio, ignore_errors=True)
+
+    resultado['base'] = cronometra(lambda: BaseDRE.de_dres(dres), repeticoes)
+    base = BaseDRE.de_dres(dres)
+    resultado['cubo'] = cronometra(lambda: base.cubo, repeticoes, lambda: setattr(base, '_cubo', None))
+    # Conferencia da hierarquia de todas as contas, meses e entidades (feita na carga)
+    resultado['integridade'] = cronometra(lambda: confere(base.armazem, base.plano), repeticoes)
+
+    # Consolidado quando ha mais de uma entidade; o primeiro ano e sempre completo
+    entidade = base.entidades()[0]
+    ano = base.anos(entidade)[0]
+    selecoes = [deriva_frames(base, entidade, ano, meses) for meses in SELECOES]
+
+    def deriva():
+        for frames in selecoes:
+            frames.kpis()
+            for nome in CALCULOS:
+                frames[nome]
+
+    def metricas():
+        for frames in selecoes:
+            for nome in CALCULOS:
+                frames.metricas(nome)
+
+    def so_frames():
+        # Frames no cache, metricas nao: mede so o calculo das metricas
+        derivados._cache.limpa()
+        deriva()
+
+    resultado['derivacao'] = cronometra(deriva, repeticoes, derivados._cache.limpa)
+    resultado['metricas'] = cronometra(metricas, repeticoes, so_frames)
+
+    # Um mes ligado na selecao com as metricas em cache: agregado incremental a partir da selecao anterior
+    alternada = deriva_frames(base, entidade, ano, SELECOES[2] + [MESES[6]])
+
+    def alterna_mes():
+        for nome in CALCULOS:
+            alternada.metricas(nome)
+
+    def so_selecao_anterior():
+        so_frames()
+        metricas()
+        for nome in CALCULOS:
+            alternada[nome]
+
+    resultado['alterna_mes'] = cronometra(alterna_mes, repeticoes, so_selecao_anterior)
+
+    # Variacoes (MoM, YoY e orcado, aqui a propria base) de todas as contas de todas as entidades do ano de uma vez
+    entidades = [e for e in base.entidades() if ano in base.anos(e)]
+    resultado['variacoes'] = cronometra(lambda: calcula_variacoes(base, entidades, ano, SELECOES[1], base), repeticoes)
+
+    # Figuras no regime do rerun: esqueletos ja em cache, so os dados da selecao mudam
+    graficos._moldes.limpa()
+    figuras_fabrica(selecoes[0])
+    resultado['figuras'] = cronometra(lambda: [figuras_fabrica(frames) for frames in selecoes], repeticoes)
+
+    figuras = [figura for frames in selecoes for figura in figuras_fabrica(frames)]
+    resultado['serializa_figuras'] = cronometra(lambda: [pio.to_json(figura, validate=False) for figura in figuras], repeticoes)
+    if pa is not None:
+        tabelas = [frames[nome] for frames in selecoes for nome in CALCULOS]
+        resultado['serializa_tabelas'] = cronometra(lambda: [_serializa(tabela) for tabela in tabelas], repeticoes)
+    return resultado
+
+
+def _serializa(dataframe):
+    # Mesmo caminho do st.dataframe: tabela Arrow gravada no formato IPC
+    tabela = pa.Table.from_pandas(dataframe)
+    saida = pa.BufferOutputStream()
+    with pa.ipc.new_stream(saida, tabela.schema) as escritor:
+        escritor.write_table(tabela)
+    return saida.getvalue()
+
+
+def compara(resultados, baseline, limite=LIMITE, folga_ms=FOLGA_MS, fator=1.0):
+    '''
+    Funcao compara os tempos com o baseline salvo.
+    input: {escala: {etapa: ms}}, baseline no mesmo formato, limite relativo, folga em ms
+           e fator de velocidade da maquina (calibracao atual / calibracao do baseline)
+    output: lista de tuplas (escala, etapa, ms do baseline ajustado, ms atual) das regressoes
+    '''
+    regressoes = []
+    for escala, etapas in resultados.items():
+        for etapa, atual in etapas.items():
+            anterior = baseline.get(escala, {}).get(etapa)
+            if anterior is None:
+                continue
+            anterior *= fator
+            if atual > anterior * (1 + limite) and atual - anterior > folga_ms:
+                regressoes.append((escala, etapa, anterior, atual))
+    return regressoes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark de escala da DRE com dados sinteticos.')
+    parser.add_argument('--escalas', default=ESCALAS, help='lista de contas x meses x entidades, ex: 171x12x1,500x24x5')
+    parser.add_argument('--repeticoes', type=int, default=5)
+    parser.add_argument('--limite', type=float, default=LIMITE, help='aumento relativo aceito sobre o baseline (0.5 = 50%%)')
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument('--salva', action='store_true', help='grava os tempos medidos como novo baseline')
+    parser.add_argument('--sem-planilhas', action='store_true', help='nao grava/le xlsx (pula as etapas de carga)')
+    args = parser.parse_args(argv)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as arquivo:
+            baseline = json.load(arquivo)
+
+    calibracao = calibra(args.repeticoes)
+    fator = calibracao / baseline['calibracao'] if 'calibracao' in baseline else 1.0
+    print(f'calibracao {calibracao:.2f} ms (maquina {fator:.2f}x o tempo do baseline)')
+
+    resultados = {}
+    for escala in args.escalas.split(','):
+        resultados[escala] = mede_escala(*le_escala(escala), args.repeticoes, not args.sem_planilhas)
+        print(f'\n{escala} (contas x meses x entidades)')
+        for etapa, ms in resultados[escala].items():
+            anterior = baseline.get('escalas', {}).get(escala, {}).get(etapa)
+            comparacao = f'  baseline {anterior * fator:10.2f} ms ({ms / (anterior * fator) - 1:+.0%})' if anterior else ''
+            print(f'  {etapa:18s} {ms:10.2f} ms{comparacao}')
+
+    if args.salva:
+        baseline['calibracao'] = round(calibracao, 3)
+        baseline.setdefault('escalas', {}).update({escala: {etapa: round(ms, 3) for etapa, ms in etapas.items()}
+                                                   for escala, etapas in resultados.items()})
+        with open(args.baseline, 'w', encoding='utf-8') as arquivo:
+            json.dump(baseline, arquivo, indent=2)
+        print(f'\nbaseline gravado em {args.baseline}')
+        return 0
+
+    regressoes = compara(resultados, baseline.get('escalas', {}), args.limite, fator=fator)
+    for escala, etapa, anterior, atual in regressoes:
+        print(f'REGRESSAO {escala} {etapa}: {anterior:.2f} -> {atual:.2f} ms', file=sys.stderr)
+    return 1 if regressoes else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,161 @@
+'''
+Benchmark do tempo de montagem das figuras por rerun: plotly express/graph_objects direto x fabrica de figuras
+(dre.graficos), que guarda o esqueleto de cada grafico e so troca os arrays da selecao de meses.
+
+Tambem compara uma serie longa (dados diarios de varios anos) entre o px.line direto e a fabrica, que decima
+os tracos (LTTB) e passa para scattergl: tempo de montagem e tamanho do JSON enviado ao navegador.
+
+Uso: python benchmarks/bench_graficos.py [DRE_G.xlsx] [repeticoes]
+'''
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import plotly.express as px
+import plotly.graph_objects as go
+import plotly.subplots as sp
+
+from dre import graficos
+from dre.base import carrega_base
+from dre.carga import ABA_PADRAO, ARQUIVO_PADRAO
+from dre.derivados import deriva_frames
+
+SELECOES = [['Jan', 'Fev', 'Mar'], ['Abr', 'Mai', 'Jun'], ['Jan', 'Fev', 'Mar', 'Abr', 'Mai', 'Jun'], ['Fev', 'Jun', 'Dez']]
+
+
+def figuras_direto(frames):
+    '''
+    Funcao monta as figuras principais como o app fazia antes, direto com plotly.
+    input: frames da selecao
+    output: lista de figuras
+    '''
+    df_rol, df_mc1, df_ebitda, df_rai = frames['df_rol'], frames['df_mc1'], frames['df_ebitda'], frames['df_rai']
+    figuras = []
+
+    fig = px.line(df_rol, x='Mes', y=['ROB', 'Imposto_venda', 'ROL'])
+    fig.update_traces(mode="markers+lines", hovertemplate=None)
+    fig.update_layout(hovermode="x unified", showlegend=False)
+    figuras.append(fig)
+
+    figuras.append(px.bar(df_rol, x='Mes', y=['COFINS', 'ICMS', 'ISS', 'Simples', 'devol_vendas', 'desc_abat'], barmode='group'))
+
+    fig = px.line(df_mc1, x='Mes', y=['ROB', 'Custo_Vendas', 'MC1'])
+    fig.update_traces(mode="markers+lines", hovertemplate=None)
+    fig.update_layout(hovermode="x unified", showlegend=False)
+    figuras.append(fig)
+
+    media = df_ebitda['ebitda'].mean()
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(x=df_ebitda['mes'], y=df_ebitda['ebitda'], mode='lines+markers', hovertemplate='Valor: %{y:,.2f}<br>Perc do Total: %{customdata:.2f}%<extra></extra>',
+                             customdata=df_ebitda['perc_ebitda']))
+    fig.add_shape(type='line', xref='paper', yref='y', x0=0, x1=1, y0=media, y1=media, line=dict(color='red', dash='dash'), name='Média')
+    fig.update_layout(xaxis_title='', yaxis_title='Ebitda', showlegend=False)
+    figuras.append(fig)
+
+    colunas = list(df_rai.columns[1:5])
+    fig = sp.make_subplots(rows=2, cols=2, subplot_titles=colunas)
+    for i, coluna in enumerate(colunas):
+        fig.add_trace(go.Scatter(x=df_rai['mes'], y=df_rai[coluna], mode='lines+markers', line=go.scatter.Line()), row=i // 2 + 1, col=i % 2 + 1)
+    fig.update_layout(height=600, width=1080, title_text="RAI", showlegend=False)
+    figuras.append(fig)
+    return figuras
+
+
+def figuras_fabrica(frames):
+    '''
+    Funcao monta as mesmas figuras pela fabrica de figuras.
+    input: frames da selecao
+    output: lista de figuras
+    '''
+    df_rol, df_mc1, df_ebitda, df_rai = frames['df_rol'], frames['df_mc1'], frames['df_ebitda'], frames['df_rai']
+    colunas = list(df_rai.columns[1:5])
+    return [graficos.linhas(df_rol, 'Mes', ['ROB', 'Imposto_venda', 'ROL'], mostra_legenda=False),
+            graficos.barras(df_rol, 'Mes', ['COFINS', 'ICMS', 'ISS', 'Simples', 'devol_vendas', 'desc_abat']),
+            graficos.linhas(df_mc1, 'Mes', ['ROB', 'Custo_Vendas', 'MC1'], mostra_legenda=False),
+            graficos.linha_media(df_ebitda, 'mes', 'ebitda', 'perc_ebitda', df_ebitda['ebitda'].mean(), 'Ebitda'),
+            graficos.grade(df_rai, 'mes', colunas, colunas, 2, 2, "RAI", 600, 1080)]
+
+
+def mede(monta, lista_frames, repeticoes):
+    '''
+    Funcao mede o tempo medio por rerun (uma selecao de meses) da funcao de montagem.
+    input: funcao de montagem, lista de frames por selecao e repeticoes
+    output: tempo medio em milissegundos
+    '''
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        for frames in lista_frames:
+            monta(frames)
+    return (time.perf_counter() - inicio) * 1000 / (repeticoes * len(lista_frames))
+
+
+def serie_longa(dias=5 * 365, series=14, repeticoes=5):
+    '''
+    Funcao compara px.line direto e graficos.linhas em uma serie diaria longa com varias contas.
+    input: numero de dias, numero de series e repeticoes
+    output: dicionario {nome: (ms por figura, kB de JSON)}
+    '''
+    gerador = np.random.default_rng(0)
+    colunas = [f'conta_{i}' for i in range(series)]
+    df = pd.DataFrame(np.cumsum(gerador.normal(size=(dias, series)), axis=0), columns=colunas)
+    df.insert(0, 'dia', pd.date_range('2021-01-01', periods=dias))
+
+    def direto():
+        figura = px.line(df, x='dia', y=colunas)
+        figura.update_traces(mode="markers+lines", hovertemplate=None)
+        figura.update_layout(hovermode="x unified")
+        return figura
+
+    resultado = {}
+    graficos._moldes.limpa()
+    for nome, monta in (('px.line direto', direto), ('fabrica (LTTB)', lambda: graficos.linhas(df, 'dia', colunas))):
+        monta()
+        inicio = time.perf_counter()
+        for _ in range(repeticoes):
+            figura = monta()
+        resultado[nome] = ((time.perf_counter() - inicio) * 1000 / repeticoes, len(figura.to_json()) / 1024)
+    return resultado
+
+
+def main():
+    arquivo = sys.argv[1] if len(sys.argv) > 1 else ARQUIVO_PADRAO
+    repeticoes = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+    base = carrega_base(((arquivo, 'Empresa', 0, ABA_PADRAO),))
+    entidade = base.entidades()[0]
+    ano = base.anos(entidade)[0]
+
+    # Frames calculados antes, para medir so a montagem das figuras
+    lista_frames = []
+    for meses in SELECOES:
+        frames = deriva_frames(base, entidade, ano, meses)
+        for nome in ('df_rol', 'df_mc1', 'df_ebitda', 'df_rai'):
+            frames[nome]
+        lista_frames.append(frames)
+
+    graficos._moldes.limpa()
+    inicio = time.perf_counter()
+    figuras_fabrica(lista_frames[0])
+    primeiro = (time.perf_counter() - inicio) * 1000
+
+    direto = mede(figuras_direto, lista_frames, repeticoes)
+    fabrica = mede(figuras_fabrica, lista_frames, repeticoes)
+
+    print(f'figuras por rerun: {len(figuras_direto(lista_frames[0]))}')
+    print(f'plotly direto      : {direto:8.2f} ms/rerun')
+    print(f'fabrica (1a vez)   : {primeiro:8.2f} ms/rerun')
+    print(f'fabrica (em cache) : {fabrica:8.2f} ms/rerun')
+    print(f'ganho              : {direto / fabrica:8.1f}x')
+
+    print('\nserie longa (5 anos diarios x 14 contas)')
+    for nome, (ms, kb) in serie_longa().items():
+        print(f'{nome:18s} : {ms:8.2f} ms/figura {kb:10.1f} kB de JSON')
+
+
+if __name__ == '__main__':
+    main()
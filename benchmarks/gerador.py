@@ -0,0 +1,180 @@
+'''
+Gerador de DREs sinteticas com a mesma estrutura de contas da planilha de origem (1.x receitas, 8.x despesas,
+10.x resultado financeiro...), em tamanhos configuraveis: N contas x M meses x K entidades.
+As contas folha recebem valores aleatorios (com sinal de receita ou despesa) e os totais sao sempre a soma dos filhos,
+com as linhas de resultado (ROL, MC1, MC2, Ebitda...) calculadas pelos SUBTOTAIS do plano de contas.
+
+Uso: python benchmarks/gerador.py saida [contas] [meses] [entidades]
+     grava <entidade>_<ano>.xlsx (aba DRE_dummy) no diretorio saida, no formato lido por descobre_planilhas
+'''
+import math
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+
+from dre.base import BaseDRE
+from dre.carga import ABA_PADRAO, MESES
+from dre.hierarquia import SUBTOTAIS, PlanoContas
+
+MODELO = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'DRE_G_origem.xlsx')
+ANO_INICIAL = 2021
+
+# Grupos que recebem as contas extras, em rodizio: receitas, despesas operacionais e resultado financeiro
+GRUPOS_EXTRAS = [('1', 'Receita sintetica'), ('8', 'Despesa sintetica'), ('10', 'Resultado financeiro sintetico')]
+# Codigos das contas de receita (positivas, com os descendentes); as demais folhas sao custos e despesas (negativas)
+RECEITAS = ('1', '10.1', '12.1')
+# Receitas fora da operacao (financeiras e nao operacionais) em relacao a ROB
+MARGEM_OUTRAS_RECEITAS = 0.03
+# Parte das folhas fica zerada, como na planilha real (exercita a remocao de colunas zeradas)
+PROPORCAO_ZERADAS = 0.3
+# Custos e despesas em relacao a receita
+MARGEM_DESPESAS = 0.85
+
+
+def plano_modelo(modelo=MODELO):
+    '''
+    Funcao le os nomes das contas da planilha de origem (primeira coluna, a partir da terceira linha).
+    input: caminho da planilha de origem
+    output: lista de nomes de contas na ordem da DRE
+    '''
+    contas = pd.read_excel(modelo, header=None, usecols=[0]).iloc[2:, 0].dropna().astype(str).str.strip().tolist()
+    # A planilha de origem nao tem a conta 1.3 usada pelo dashboard
+    if '1.3 – Pacotes' not in contas:
+        contas.insert(contas.index('1.2 - Prestação De Serviços') + 1, '1.3 – Pacotes')
+    return contas
+
+
+def plano_sintetico(n_contas=None, modelo=MODELO):
+    '''
+    Funcao estende o plano de contas do modelo ate n_contas, acrescentando contas folha em rodizio
+    nos grupos 1, 8 e 10 (ex: '8.10 - Despesa sintetica 1'), logo depois do ultimo descendente do grupo.
+    input: numero de contas (None ou menor que o modelo = plano do modelo) e caminho da planilha de origem
+    output: lista de nomes de contas na ordem da DRE
+    '''
+    contas = plano_modelo(modelo)
+    extras = max((n_contas or 0) - len(contas), 0)
+    if not extras:
+        return contas
+
+    plano = PlanoContas(contas)
+    novas = {codigo: [] for codigo, _ in GRUPOS_EXTRAS}
+    proximo = {codigo: len(plano.filhos[plano.conta(codigo)]) + 1 for codigo, _ in GRUPOS_EXTRAS}
+    for i in range(extras):
+        codigo, rotulo = GRUPOS_EXTRAS[i % len(GRUPOS_EXTRAS)]
+        novas[codigo].append(f'{codigo}.{proximo[codigo]} - {rotulo} {len(novas[codigo]) + 1}')
+        proximo[codigo] += 1
+
+    resultado = list(contas)
+    for codigo, _ in GRUPOS_EXTRAS:
+        ultima = plano.grupo(codigo)[-1]
+        posicao = resultado.index(ultima) + 1
+        resultado[posicao:posicao] = novas[codigo]
+    return resultado
+
+
+def _raiz_receita(codigo):
+    # Codigo de receita que contem a conta (ex: '10.1.4' -> '10.1') ou None para custos e despesas
+    return next((raiz for raiz in RECEITAS if codigo is not None and (codigo == raiz or codigo.startswith(raiz + '.'))), None)
+
+
+def gera_dre(contas, meses=MESES, escala=1.0, semente=0):
+    '''
+    Funcao gera uma DRE (contas x meses) coerente: folhas aleatorias, totais pela soma dos filhos e linhas de resultado pelos SUBTOTAIS.
+    input: lista de contas, lista de meses (Jan..Dez), escala dos valores (ex: porte da entidade) e semente (inteiro ou tupla)
+    output: dataframe no formato da aba DRE_dummy (indice Variaveis, uma coluna por mes)
+    '''
+    plano = PlanoContas(contas)
+    gerador = np.random.default_rng(semente)
+    posicao = {conta: i for i, conta in enumerate(contas)}
+    folhas = np.array([i for i, conta in enumerate(contas) if not plano.filhos[conta] and conta not in SUBTOTAIS])
+
+    # Valor tipico por conta (lognormal) com sazonalidade comum aos meses e ruido por mes
+    tipico = gerador.lognormal(mean=9.0, sigma=1.5, size=len(folhas)) * escala
+    sazonal = 1 + 0.15 * np.sin(np.arange(len(meses)) * 2 * np.pi / 12 + gerador.uniform(0, 2 * np.pi))
+    ruido = gerador.uniform(0.8, 1.2, size=(len(folhas), len(meses)))
+    raizes = [_raiz_receita(plano.codigo[contas[i]]) for i in folhas]
+    operacionais = np.array([raiz == '1' for raiz in raizes])
+    outras = np.array([raiz not in (None, '1') for raiz in raizes])
+    despesas = ~operacionais & ~outras
+    zeradas = gerador.random(len(folhas)) < PROPORCAO_ZERADAS
+    valores = tipico[:, None] * sazonal[None, :] * ruido * ~zeradas[:, None]
+    # Despesas e outras receitas proporcionais a ROB, para as margens ficarem plausiveis com qualquer numero de contas
+    rob = valores[operacionais].sum()
+    valores[despesas] *= -MARGEM_DESPESAS * rob / max(valores[despesas].sum(), 1.0)
+    valores[outras] *= MARGEM_OUTRAS_RECEITAS * rob / max(valores[outras].sum(), 1.0)
+
+    matriz = np.zeros((len(contas), len(meses)))
+    matriz[folhas] = np.round(valores, 2)
+    # Totais de baixo para cima: cada pai e a soma dos filhos ja somados
+    for conta in reversed(contas):
+        if plano.filhos[conta]:
+            matriz[posicao[conta]] = matriz[[posicao[filho] for filho in plano.filhos[conta]]].sum(axis=0)
+    for conta, parcelas in SUBTOTAIS.items():
+        if conta in posicao:
+            matriz[posicao[conta]] = matriz[[posicao[parcela] for parcela in parcelas if parcela in posicao]].sum(axis=0)
+    return pd.DataFrame(matriz, index=pd.Index(contas, name='Variaveis'), columns=list(meses))
+
+
+def periodos(n_meses, ano_inicial=ANO_INICIAL):
+    '''
+    Funcao distribui M meses em anos consecutivos; o ultimo ano pode ficar incompleto (meses ainda nao fechados).
+    input: numero de meses e ano inicial
+    output: lista de tuplas (ano, lista de meses)
+    '''
+    anos = math.ceil(n_meses / len(MESES))
+    return [(ano_inicial + i, MESES[:min(len(MESES), n_meses - i * len(MESES))]) for i in range(anos)]
+
+
+def gera_dres(n_contas=None, n_meses=12, n_entidades=1, semente=0, modelo=MODELO):
+    '''
+    Funcao gera as DREs de K entidades ao longo de M meses, com portes diferentes por entidade.
+    input: numero de contas, meses, entidades, semente e caminho da planilha de origem
+    output: lista de tuplas (entidade, ano, dataframe da DRE)
+    '''
+    contas = plano_sintetico(n_contas, modelo)
+    portes = np.random.default_rng(semente).uniform(0.5, 2.0, size=n_entidades)
+    dres = []
+    for e in range(n_entidades):
+        for ano, meses in periodos(n_meses):
+            dres.append((f'Loja_{e + 1:03d}', ano, gera_dre(contas, meses, portes[e], semente=(semente, e, ano))))
+    return dres
+
+
+def gera_base(n_contas=None, n_meses=12, n_entidades=1, semente=0, modelo=MODELO):
+    # Base em memoria, sem gravar planilhas (mede derivacao, metricas e figuras em escalas grandes)
+    return BaseDRE.de_dres(gera_dres(n_contas, n_meses, n_entidades, semente, modelo))
+
+
+def grava_planilhas(diretorio, dres, aba=ABA_PADRAO):
+    '''
+    Funcao grava as DREs como planilhas <entidade>_<ano>.xlsx, no mesmo formato lido pelo dashboard.
+    input: diretorio, lista de tuplas (entidade, ano, dataframe da DRE) e nome da aba
+    output: lista de tuplas (caminho, entidade, ano, aba) como a de descobre_planilhas
+    '''
+    os.makedirs(diretorio, exist_ok=True)
+    planilhas = []
+    for entidade, ano, df in dres:
+        caminho = os.path.join(diretorio, f'{entidade}_{ano}.xlsx')
+        df.reset_index().to_excel(caminho, sheet_name=aba, index=False)
+        planilhas.append((caminho, entidade, ano, aba))
+    return planilhas
+
+
+def main():
+    if len(sys.argv) < 2:
+        sys.exit(__doc__)
+    saida = sys.argv[1]
+    n_contas = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    n_meses = int(sys.argv[3]) if len(sys.argv) > 3 else 12
+    n_entidades = int(sys.argv[4]) if len(sys.argv) > 4 else 1
+
+    planilhas = grava_planilhas(saida, gera_dres(n_contas, n_meses, n_entidades))
+    print(f'{len(planilhas)} planilhas gravadas em {saida}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1 @@
+# Pacote com as rotinas de carga e calculo da DRE usadas pelo dashboard Streamlit
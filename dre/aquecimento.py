@@ -0,0 +1,67 @@
+'''
+Aquecimento dos caches na subida do servidor: uma thread de fundo carrega a base, calcula os frames, KPIs e metricas
+da selecao inicial da sidebar de cada entidade e importa o plotly, para o primeiro usuario depois de um deploy
+ou reinicio nao pagar por tudo. Os caches sao os mesmos do dashboard (processo do Streamlit).
+'''
+import threading
+
+from dre import graficos
+from dre.base import carrega_base
+from dre.carga import MESES_PADRAO
+from dre.derivados import CALCULOS, deriva_frames
+
+_aquecimento = None
+_trava = threading.Lock()
+
+
+def aquece_selecao(base, entidade, ano, meses):
+    '''
+    Funcao calcula e guarda no cache os KPIs, todos os frames das secoes e as metricas de uma selecao.
+    input: BaseDRE, entidade, ano e lista de meses
+    output: FramesSelecao
+    '''
+    frames = deriva_frames(base, entidade, ano, meses)
+    frames.kpis()
+    for nome in CALCULOS:
+        frames[nome]
+        frames.metricas(nome)
+    return frames
+
+
+def aquece_base(lista_planilhas, meses=MESES_PADRAO):
+    '''
+    Funcao carrega a base e aquece a selecao inicial de cada entidade no ultimo ano (o mesmo padrao da sidebar).
+    input: funcao sem argumentos que retorna a lista de planilhas e meses da selecao inicial
+    output: BaseDRE
+    '''
+    base = carrega_base(lista_planilhas())
+    for entidade in base.entidades():
+        ano = base.anos(entidade)[-1]
+        disponiveis = base.meses(entidade, ano)
+        aquece_selecao(base, entidade, ano, [mes for mes in meses if mes in disponiveis])
+    return base
+
+
+def aquece(lista_planilhas, meses=MESES_PADRAO):
+    '''
+    Funcao inicia, uma unica vez por processo, a thread de aquecimento: primeiro os dados (carga e selecao inicial),
+    depois o plotly e os validadores carregados no primeiro grafico.
+    input: funcao sem argumentos que retorna a lista de planilhas e meses da selecao inicial
+    output: thread de aquecimento
+    '''
+    global _aquecimento
+    with _trava:
+        if _aquecimento is not None:
+            return _aquecimento
+
+        def executa():
+            try:
+                aquece_base(lista_planilhas, meses)
+            except Exception:
+                # Planilha ausente ou invalida: o dashboard mostra o erro na primeira sessao
+                pass
+            graficos.aquece()
+
+        _aquecimento = threading.Thread(target=executa, name='aquecimento', daemon=True)
+        _aquecimento.start()
+        return _aquecimento
@@ -0,0 +1,194 @@
+'''
+Armazem numerico da DRE: os valores de todas as entidades e anos ficam em uma unica matriz int64 continua
+[entidade/ano x mes x conta] em centavos, e os metadados (plano de contas e blocos entidade/ano) em uma tabela
+pequena separada. Somas em centavos sao exatas e cada bloco entidade/ano e uma fatia da matriz, sem copia.
+
+Gravado em disco (valores .npy + metadados .json) o armazem e reaberto como memory-map somente leitura: os processos
+que abrem o mesmo arquivo dividem as mesmas paginas, que ficam no cache de paginas do sistema e nao na memoria
+de cada processo.
+'''
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from dre.carga import MESES
+
+# Valores guardados em centavos (int64 soma ate ~9e16 centavos sem perder precisao)
+ESCALA = 100
+# Celula vazia na planilha (NaN) e conta/mes que nao existe no bloco; os dois menores int64, nunca valores reais
+NULO = np.iinfo(np.int64).min
+AUSENTE = NULO + 1
+# Versao do formato gravado em disco
+FORMATO = 1
+# Niveis da serie longa reconstruida (valores)
+NIVEIS = ['entidade', 'ano', 'mes', 'conta']
+
+
+def para_centavos(valores):
+    # Array float (NaN = vazio) -> int64 em centavos com NULO no lugar dos vazios
+    valores = np.asarray(valores, dtype='float64')
+    vazios = np.isnan(valores)
+    centavos = np.rint(np.where(vazios, 0, valores) * ESCALA).astype(np.int64)
+    centavos[vazios] = NULO
+    return centavos
+
+
+def para_decimais(centavos):
+    # Array int64 em centavos -> float com NaN nos vazios e ausentes
+    valores = centavos / ESCALA
+    valores[centavos <= AUSENTE] = np.nan
+    return valores
+
+
+def arredonda(valores):
+    # Valores float arredondados para centavos, como ficam no armazem (NaN continua NaN)
+    return para_decimais(para_centavos(valores))
+
+
+def zera_vazios(centavos):
+    # Vazios e ausentes somam como zero, igual ao sum() do pandas
+    return np.where(centavos <= AUSENTE, 0, centavos)
+
+
+class Armazem:
+    '''
+    Matriz int64 [entidade/ano x mes x conta] em centavos com o plano de contas e os blocos entidade/ano.
+    A matriz e compartilhada (pode ser um memory-map somente leitura) e nunca e alterada:
+    troca_meses devolve um armazem novo.
+    '''
+
+    def __init__(self, centavos, contas, blocos):
+        self.centavos = centavos
+        self.contas = pd.Index(contas)
+        self.blocos = {(entidade, int(ano)): i for i, (entidade, ano) in enumerate(blocos)}
+
+    @classmethod
+    def de_dres(cls, dres, contas):
+        '''
+        Funcao monta o armazem direto das DREs lidas, cada uma copiada para o seu bloco da matriz.
+        input: lista de tuplas (entidade, ano, dataframe contas x meses Jan..Dez) e lista de contas na ordem da DRE
+        output: Armazem
+        '''
+        contas = pd.Index(contas)
+        centavos = np.full((len(dres), len(MESES), len(contas)), AUSENTE, dtype=np.int64)
+        for bloco, (_, _, df) in zip(centavos, dres):
+            meses = [MESES.index(mes) for mes in df.columns]
+            bloco[np.ix_(meses, contas.get_indexer(df.index))] = para_centavos(df.to_numpy(dtype='float64')).T
+        return cls(centavos, contas, [(entidade, ano) for entidade, ano, _ in dres])
+
+    def com_blocos(self, dres):
+        # Armazem novo com blocos entidade/ano a mais (ex: o Consolidado de cada ano), contas do mesmo plano
+        novos = Armazem.de_dres(dres, self.contas)
+        return Armazem(np.concatenate([self.centavos, novos.centavos]), self.contas, list(self.blocos) + list(novos.blocos))
+
+    @classmethod
+    def abre(cls, caminho):
+        '''
+        Funcao abre o armazem gravado como memory-map somente leitura.
+        input: caminho sem extensao (valores em <caminho>.npy e metadados em <caminho>.json)
+        output: Armazem ou None se o arquivo nao existe ou e de outro formato
+        '''
+        try:
+            with open(f'{caminho}.json', encoding='utf-8') as arquivo:
+                metadados = json.load(arquivo)
+            if metadados.get('formato') != FORMATO or metadados.get('escala') != ESCALA:
+                return None
+            centavos = np.load(f'{caminho}.npy', mmap_mode='r')
+        except (OSError, ValueError):
+            return None
+        return cls(centavos, metadados['contas'], metadados['blocos'])
+
+    def grava(self, caminho, trocas=None):
+        '''
+        Funcao grava a matriz (.npy) e os metadados (.json); os dois arquivos sao trocados de forma atomica.
+        Com trocas, a matriz e copiada direto para o arquivo novo (mapeado) com os blocos trocados, sem montar a
+        matriz nova na memoria do processo.
+        input: caminho sem extensao e dicionario {posicao do bloco: bloco [mes x conta] novo} (None = sem trocas)
+        output: None
+        '''
+        os.makedirs(os.path.dirname(os.path.abspath(caminho)), exist_ok=True)
+        metadados = {'formato': FORMATO, 'escala': ESCALA, 'contas': list(self.contas),
+                     'blocos': [[entidade, ano] for entidade, ano in self.blocos]}
+        if trocas:
+            destino = np.lib.format.open_memmap(f'{caminho}.npy.tmp', mode='w+', dtype=self.centavos.dtype, shape=self.centavos.shape)
+            destino[:] = self.centavos
+            for posicao, bloco in trocas.items():
+                destino[posicao] = bloco
+            destino.flush()
+            del destino
+        else:
+            with open(f'{caminho}.npy.tmp', 'wb') as arquivo:
+                np.save(arquivo, np.ascontiguousarray(self.centavos))
+        with open(f'{caminho}.json.tmp', 'w', encoding='utf-8') as arquivo:
+            json.dump(metadados, arquivo)
+        os.replace(f'{caminho}.npy.tmp', f'{caminho}.npy')
+        os.replace(f'{caminho}.json.tmp', f'{caminho}.json')
+
+    def bloco(self, entidade, ano):
+        # Fatia [mes x conta] da entidade/ano, sem copia
+        return self.centavos[self.blocos[(entidade, ano)]]
+
+    def meses(self):
+        '''
+        Funcao retorna os meses existentes (algum valor ou vazio de planilha) de cada entidade/ano.
+        output: dicionario {(entidade, ano): lista com o numero dos meses}
+        '''
+        presentes = (self.centavos != AUSENTE).any(axis=2)
+        return {bloco: [int(mes) + 1 for mes in np.flatnonzero(presentes[i])] for bloco, i in self.blocos.items() if presentes[i].any()}
+
+    def fatia(self, entidade, ano, numeros=None):
+        '''
+        Funcao retorna os meses pedidos da entidade/ano em float, so com as contas e meses que existem no bloco.
+        input: entidade, ano e lista com o numero dos meses (None = todos)
+        output: dataframe (indice = numero do mes, colunas = contas na ordem do plano)
+        '''
+        bloco = self.bloco(entidade, ano)
+        existe = bloco != AUSENTE
+        meses = np.flatnonzero(existe.any(axis=1))
+        if numeros is not None:
+            meses = meses[np.isin(meses, np.asarray(numeros, dtype=int) - 1)]
+        contas = np.flatnonzero(existe.any(axis=0))
+        # So os meses e contas da selecao saem da matriz (np.ix_ copia apenas esse pedaco)
+        return pd.DataFrame(para_decimais(bloco[np.ix_(meses, contas)]), index=meses + 1, columns=self.contas[contas])
+
+    def tabela(self, entidade, ano):
+        # Entidade/ano no formato da planilha: contas x numero do mes, so as contas e meses existentes
+        return self.fatia(entidade, ano).T
+
+    def valores(self):
+        '''
+        Funcao reconstroi a serie longa (entidade, ano, mes, conta) de todas as celulas existentes, vazios como NaN.
+        Usada nos caminhos frios (consolidacao e carga incremental), nunca no rerun.
+        output: serie de float
+        '''
+        blocos, meses, contas = np.nonzero(self.centavos != AUSENTE)
+        chaves = list(self.blocos)
+        indice = pd.MultiIndex.from_arrays([[chaves[i][0] for i in blocos], [chaves[i][1] for i in blocos], meses + 1, self.contas[contas]],
+                                           names=NIVEIS)
+        return pd.Series(para_decimais(self.centavos[blocos, meses, contas]), index=indice, name='valor').sort_index()
+
+    def troca_meses(self, entidade, ano, df, meses, caminho=None):
+        '''
+        Funcao retorna um armazem novo com os meses da entidade/ano trocados pelos da planilha; mes pedido que nao esta
+        mais na planilha passa a ausente. So o bloco da entidade/ano e copiado e alterado. Com caminho, o armazem novo
+        e gravado direto da matriz atual e reaberto como memory-map; sem caminho, a matriz nova fica em memoria.
+        input: entidade, ano, dataframe da DRE (contas x meses Jan..Dez, contas do plano), lista com o numero dos meses
+               e caminho sem extensao (None = so na memoria)
+        output: Armazem
+        '''
+        posicao = self.blocos[(entidade, ano)]
+        bloco = np.array(self.centavos[posicao])
+        posicao_conta = self.contas.get_indexer(df.index)
+        for mes in meses:
+            bloco[mes - 1] = AUSENTE
+            if MESES[mes - 1] in df.columns:
+                bloco[mes - 1, posicao_conta] = para_centavos(df[MESES[mes - 1]].to_numpy(dtype='float64'))
+        if caminho is not None:
+            self.grava(caminho, {posicao: bloco})
+            armazem = Armazem.abre(caminho)
+            if armazem is not None:
+                return armazem
+        centavos = np.concatenate([self.centavos[:posicao], bloco[None], self.centavos[posicao + 1:]])
+        return Armazem(centavos, self.contas, list(self.blocos))
@@ -0,0 +1,405 @@
+import hashlib
+import itertools
+import os
+import re
+import threading
+import time
+
+import pandas as pd
+
+from dre import derivados
+from dre.armazem import Armazem, arredonda
+from dre.calculos import adiciona_perc
+from dre.carga import ABA_PADRAO, ARQUIVO_PADRAO, MESES, carrega_dre, carrega_varias, chave_arquivo
+from dre.consolidacao import ENTIDADE_GRUPO, consolida, entidades_reais
+from dre.cubo import CuboMensal
+from dre.hierarquia import PlanoContas
+from dre.integridade import confere
+from dre.medicao import mede
+
+# Nome padrao das planilhas no diretorio de dados: <entidade>_<ano>.xlsx, ex: Loja_Centro_2022.xlsx
+PADRAO_ARQUIVO = r'^(?P<entidade>.+)_(?P<ano>\d{4})\.xlsx$'
+DIRETORIO_DADOS = 'dados'
+# Orcamento: planilhas <entidade>_<ano>.xlsx no mesmo layout da DRE (aba DRE_dummy), ver dre.variacoes
+DIRETORIO_ORCAMENTO = os.environ.get('DRE_ORCAMENTO', 'orcamento')
+# Armazens em centavos gravados na carga e reabertos como memory-map (vazio = so na memoria), ver dre.armazem
+DIRETORIO_ARMAZEM = os.environ.get('DRE_ARMAZEM', '.armazem')
+
+_cache = {}
+_orcamentos = {}
+_trava = threading.Lock()
+_vigia = None
+# Cada base carregada recebe uma versao nova, usada na chave dos caches de frames derivados
+_versoes = itertools.count(1)
+
+
+class BaseDRE:
+    '''
+    Base unica da DRE: matriz [entidade/ano x mes x conta] em centavos (ver dre.armazem) e,
+    sob demanda, o formato longo indexado por (entidade, ano, mes, conta).
+    mes e o numero do mes (1 a 12); contas guarda a ordem do plano de contas.
+    '''
+
+    def __init__(self, armazem):
+        self.armazem = armazem
+        self.contas = list(armazem.contas)
+        self.versao = next(_versoes)
+        # Caminho do armazem gravado em disco (sem extensao), None = so na memoria
+        self.caminho = None
+        # Arvore do plano de contas calculada uma vez por carga
+        self.plano = PlanoContas(self.contas)
+        self._cubo = None
+        self._discrepancias = None
+        # Versao dos dados por (entidade, ano, mes), alterada na carga incremental de meses
+        self._versoes_mes = {}
+        # Indice de entidade/ano -> meses disponiveis, usado pelos filtros da sidebar
+        self._meses = armazem.meses()
+
+    @property
+    def valores(self):
+        # Serie longa reconstruida do armazem: so para os caminhos frios (consolidacao), nao fica na memoria
+        return self.armazem.valores()
+
+    @property
+    def cubo(self):
+        # Cubo de somas acumuladas por mes, montado na primeira consulta de totais
+        if self._cubo is None:
+            with mede('cubo'):
+                self._cubo = CuboMensal(self)
+        return self._cubo
+
+    @property
+    def discrepancias(self):
+        # Relatorio da conferencia da hierarquia (conta = soma dos filhos, resultados de SUBTOTAIS), ver dre.integridade
+        if self._discrepancias is None:
+            self._discrepancias = confere(self.armazem, self.plano)
+        return self._discrepancias
+
+    @classmethod
+    def de_planilhas(cls, planilhas, processos=None):
+        '''
+        Funcao monta a base a partir de varias planilhas (uma por entidade e ano).
+        As planilhas ainda nao carregadas sao lidas em paralelo em um pool de processos.
+        input: lista de tuplas (caminho, entidade, ano, aba) e numero de processos (None = numero de CPUs)
+        output: BaseDRE
+        '''
+        carrega_varias([(caminho, aba) for caminho, _, _, aba in planilhas], processos)
+        return cls.de_dres([(entidade, ano, carrega_dre(caminho, aba)[0]) for caminho, entidade, ano, aba in planilhas])
+
+    @classmethod
+    def de_dres(cls, dres):
+        '''
+        Funcao monta a base a partir de DREs ja lidas (ex: planilhas do cache ou DREs sinteticas dos benchmarks).
+        input: lista de tuplas (entidade, ano, dataframe da DRE com linhas = contas e colunas = meses)
+        output: BaseDRE
+        '''
+        with mede('base'):
+            return cls._de_dres(dres)
+
+    @classmethod
+    def _de_dres(cls, dres):
+        contas = []
+        vistas = set()
+        for _, _, df in dres:
+            # Contas novas entram no plano na ordem em que aparecem
+            for conta in df.index:
+                if conta not in vistas:
+                    vistas.add(conta)
+                    contas.append(conta)
+        armazem = Armazem.de_dres([(entidade, int(ano), df) for entidade, ano, df in dres], contas)
+
+        # Ano com mais de uma entidade ganha a entidade Consolidado (soma alinhada pelo plano - eliminacoes), em centavos:
+        # o grupo fecha exatamente com a soma das lojas
+        grupos = [(ENTIDADE_GRUPO, ano, consolida(armazem, ano)) for ano in sorted({ano for _, ano in armazem.blocos})]
+        grupos = [grupo for grupo in grupos if grupo[2] is not None]
+        return cls(armazem.com_blocos(grupos) if grupos else armazem)
+
+    def versao_meses(self, entidade, ano, meses):
+        '''
+        Funcao retorna a versao dos dados de cada mes selecionado (0 = carga inicial), usada nas chaves de cache.
+        input: entidade, ano e lista de meses
+        output: tupla de versoes na ordem dos meses
+        '''
+        return tuple(self._versoes_mes.get((entidade, ano, numero), 0) for numero in sorted(MESES.index(mes) + 1 for mes in meses))
+
+    def meses_alterados(self, entidade, ano, df):
+        '''
+        Funcao compara a planilha relida com os dados da entidade/ano na base.
+        input: entidade, ano e dataframe da DRE (contas x meses)
+        output: lista com o numero dos meses novos, removidos ou com algum valor diferente;
+                None se as linhas de contas mudaram (exige recarregar a base inteira)
+        '''
+        atual = self.armazem.tabela(entidade, ano)
+        # A planilha e comparada ja arredondada para centavos, como fica no armazem
+        novo = pd.DataFrame(arredonda(df.to_numpy(dtype='float64')), index=df.index,
+                            columns=[MESES.index(mes) + 1 for mes in df.columns])
+        if set(novo.index) != set(atual.index) or not novo.index.is_unique:
+            return None
+
+        colunas = novo.columns.union(atual.columns)
+        antes = atual.reindex(index=novo.index, columns=colunas)
+        depois = novo.reindex(columns=colunas)
+        iguais = ((antes == depois) | (antes.isna() & depois.isna())).all()
+        return [int(mes) for mes in colunas if not iguais[mes] or (mes in novo.columns) != (mes in atual.columns)]
+
+    def aplica_meses(self, entidade, ano, df, meses):
+        '''
+        Funcao troca na base so os meses alterados da entidade/ano, atualiza o cubo e a versao desses meses.
+        input: entidade, ano, dataframe da DRE (contas x meses) e lista com o numero dos meses alterados
+        output: None
+        '''
+        if not meses:
+            return
+        # Armazem novo (so o bloco da entidade/ano e copiado): as leituras em andamento continuam com a matriz anterior
+        try:
+            self.armazem = self.armazem.troca_meses(entidade, ano, df, meses, self.caminho)
+        except OSError:
+            # Diretorio somente leitura: o armazem novo fica na memoria do processo
+            self.caminho = None
+            self.armazem = self.armazem.troca_meses(entidade, ano, df, meses)
+        self._meses = self.armazem.meses()
+        if self._cubo is not None:
+            self._cubo.atualiza_bloco(self, entidade, ano)
+        self._discrepancias = None
+        # A versao muda so depois dos dados: uma chave nova nunca aponta para dados antigos
+        versao = next(_versoes)
+        for mes in meses:
+            self._versoes_mes[(entidade, ano, mes)] = versao
+
+    def reconsolida(self, ano):
+        '''
+        Funcao recalcula o consolidado do ano depois da carga incremental de alguma entidade.
+        input: ano
+        output: lista com o numero dos meses do grupo que mudaram; None se as contas do grupo mudaram
+        '''
+        if (ENTIDADE_GRUPO, ano) not in self._meses:
+            return []
+        df = consolida(self.armazem, ano)
+        meses = self.meses_alterados(ENTIDADE_GRUPO, ano, df)
+        if meses is not None:
+            self.aplica_meses(ENTIDADE_GRUPO, ano, df, meses)
+        return meses
+
+    def entidades(self):
+        # Consolidado primeiro; as eliminacoes so entram no calculo do grupo
+        entidades = {entidade for entidade, _ in self._meses}
+        grupo = [ENTIDADE_GRUPO] if ENTIDADE_GRUPO in entidades else []
+        return grupo + sorted(entidades_reais(entidades))
+
+    def participacoes(self, ano, meses, contas):
+        '''
+        Funcao retorna o total de cada entidade do ano nas contas e a participacao (perc_) na soma das entidades.
+        input: ano, lista de meses e lista de nomes de contas
+        output: dataframe indexado pela entidade
+        '''
+        entidades = [entidade for entidade in entidades_reais(self.entidades()) if (entidade, ano) in self._meses]
+        totais = self.cubo.totais_entidades(entidades, ano, meses)[contas]
+        return adiciona_perc(totais)
+
+    def anos(self, entidade):
+        return sorted(ano for ent, ano in self._meses if ent == entidade)
+
+    def meses(self, entidade, ano):
+        '''
+        Funcao retorna os nomes dos meses disponiveis (Jan..Dez) da entidade no ano.
+        input: entidade e ano
+        output: lista de meses
+        '''
+        return [MESES[m - 1] for m in self._meses.get((entidade, ano), [])]
+
+    def fatia(self, entidade, ano, meses=None):
+        '''
+        Funcao retorna a df transposta (coluna Mes + uma coluna por conta) da entidade/ano nos meses pedidos.
+        O indice e a posicao do mes no ano (0 = Jan), como na df_trans original.
+        input: entidade, ano e lista de meses (None = todos)
+        output: dataframe
+        '''
+        # Todas as contas da entidade/ano ficam, mesmo sem nenhum mes selecionado
+        numeros = None if meses is None else [MESES.index(mes) + 1 for mes in meses]
+        largo = self.armazem.fatia(entidade, ano, numeros)
+        largo.index = pd.Index(largo.index - 1, name='mes')
+        largo.insert(0, 'Mes', [MESES[i] for i in largo.index])
+        return largo
+
+
+def descobre_planilhas(diretorio, aba=ABA_PADRAO, padrao=PADRAO_ARQUIVO):
+    '''
+    Funcao lista as planilhas do diretorio que seguem o padrao <entidade>_<ano>.xlsx.
+    input: diretorio, aba e expressao regular com os grupos entidade e ano
+    output: lista de tuplas (caminho, entidade, ano, aba)
+    '''
+    if not os.path.isdir(diretorio):
+        return []
+    planilhas = []
+    for nome in sorted(os.listdir(diretorio)):
+        achado = re.match(padrao, nome)
+        if achado:
+            planilhas.append((os.path.join(diretorio, nome), achado['entidade'], int(achado['ano']), aba))
+    return planilhas
+
+
+def lista_planilhas(diretorio=DIRETORIO_DADOS):
+    # Planilhas do dashboard: <entidade>_<ano>.xlsx do diretorio de dados ou, sem ele, a planilha unica DRE_G.xlsx como exercicio 2021
+    return descobre_planilhas(diretorio) or [(ARQUIVO_PADRAO, 'Empresa', 2021, ABA_PADRAO)]
+
+
+def carrega_base(planilhas):
+    '''
+    Funcao carrega a base de varias planilhas com cache pela versao de cada arquivo.
+    input: lista de tuplas (caminho, entidade, ano, aba)
+    output: BaseDRE compartilhada entre sessoes
+    '''
+    planilhas = [tuple(p) for p in planilhas]
+    chave = tuple(chave_arquivo(caminho) + (entidade, int(ano), aba) for caminho, entidade, ano, aba in planilhas)
+    base = _cache.get(chave)
+    if base is not None:
+        return base
+    with _trava:
+        base = _cache.get(chave)
+        if base is None:
+            base = _carga_incremental(chave, planilhas) or _base_mapeada(chave, planilhas)
+            # Hierarquia conferida na carga (inclusive na vigia em segundo plano), antes de alguma sessao pedir
+            base.discrepancias
+            _cache.clear()
+            _cache[chave] = base
+        return base
+
+
+def lista_orcamento(diretorio=DIRETORIO_ORCAMENTO):
+    # Planilhas de orcamento <entidade>_<ano>.xlsx do diretorio de orcamento (vazio = sem orcamento)
+    return descobre_planilhas(diretorio)
+
+
+def carrega_orcamento(planilhas):
+    '''
+    Funcao carrega a base do orcamento (mesmo layout da DRE, com Consolidado quando o ano tem mais de uma entidade),
+    com cache pela versao de cada arquivo.
+    input: lista de tuplas (caminho, entidade, ano, aba)
+    output: BaseDRE do orcamento ou None sem planilhas
+    '''
+    if not planilhas:
+        return None
+    chave = tuple(chave_arquivo(caminho) + (entidade, int(ano), aba) for caminho, entidade, ano, aba in planilhas)
+    with _trava:
+        if chave not in _orcamentos:
+            _orcamentos.clear()
+            _orcamentos[chave] = BaseDRE.de_planilhas([tuple(p) for p in planilhas])
+        return _orcamentos[chave]
+
+
+def _caminho_armazem(chave):
+    # Caminho (sem extensao) do armazem gravado para as versoes das planilhas
+    return os.path.join(DIRETORIO_ARMAZEM, f'base_{hashlib.sha1(repr(chave).encode()).hexdigest()[:16]}')
+
+
+def _apaga_armazens(caminho=None):
+    # Apaga os armazens gravados, menos o do caminho; outro processo com o arquivo mapeado continua lendo
+    # (o sistema so libera quando ele fecha)
+    nome = os.path.basename(caminho) if caminho else None
+    for arquivo in os.listdir(DIRETORIO_ARMAZEM):
+        if arquivo.startswith('base_') and not (nome and arquivo.startswith(nome)):
+            os.remove(os.path.join(DIRETORIO_ARMAZEM, arquivo))
+
+
+def _base_mapeada(chave, planilhas):
+    '''
+    Funcao abre a base do armazem gravado para as mesmas versoes das planilhas, como memory-map, sem ler planilha nenhuma.
+    Sem o arquivo, le as planilhas, grava o armazem e o reabre mapeado; os armazens de versoes anteriores sao apagados.
+    input: chave das versoes das planilhas e lista de tuplas (caminho, entidade, ano, aba)
+    output: BaseDRE
+    '''
+    if not DIRETORIO_ARMAZEM:
+        return BaseDRE.de_planilhas(planilhas)
+    caminho = _caminho_armazem(chave)
+    armazem = Armazem.abre(caminho)
+    if armazem is not None:
+        base = BaseDRE(armazem)
+        base.caminho = caminho
+        return base
+
+    base = BaseDRE.de_planilhas(planilhas)
+    try:
+        base.armazem.grava(caminho)
+        _apaga_armazens(caminho)
+    except OSError:
+        # Diretorio somente leitura: a base fica na memoria do processo
+        return base
+    armazem = Armazem.abre(caminho)
+    if armazem is not None:
+        base.armazem, base.caminho = armazem, caminho
+    return base
+
+
+def _carga_incremental(chave, planilhas):
+    '''
+    Funcao aproveita a base ja carregada quando as planilhas sao as mesmas e so algumas mudaram de versao
+    (ex: fechamento de um mes). Rele apenas as planilhas alteradas e troca na base so os meses diferentes,
+    descartando do cache apenas as selecoes que contem esses meses.
+    input: chave nova e lista de tuplas (caminho, entidade, ano, aba)
+    output: BaseDRE atualizada ou None quando e preciso recarregar tudo
+    '''
+    identidade = [c[:1] + c[3:] for c in chave]
+    anterior = next(((c, base) for c, base in _cache.items() if [a[:1] + a[3:] for a in c] == identidade), None)
+    if anterior is None:
+        return None
+    chave_anterior, base = anterior
+
+    # Primeiro compara todas as planilhas alteradas; qualquer mudanca nas linhas de contas recarrega tudo
+    alteracoes = []
+    for nova, velha, (caminho, entidade, ano, aba) in zip(chave, chave_anterior, planilhas):
+        if nova == velha:
+            continue
+        df, _ = carrega_dre(caminho, aba)
+        meses = base.meses_alterados(entidade, int(ano), df)
+        if meses is None:
+            return None
+        alteracoes.append((entidade, int(ano), df, meses))
+
+    # Os meses trocados sao gravados no armazem da chave nova, reaberto como memory-map
+    if base.caminho is not None:
+        base.caminho = _caminho_armazem(chave)
+    for entidade, ano, df, meses in alteracoes:
+        base.aplica_meses(entidade, ano, df, meses)
+        derivados.descarta_meses(base.versao, entidade, ano, [MESES[mes - 1] for mes in meses])
+
+    # O consolidado do ano acompanha os meses alterados das entidades
+    for ano in {ano for _, ano, _, meses in alteracoes if meses}:
+        meses = base.reconsolida(ano)
+        if meses is None:
+            # O armazem da chave nova ficou so com as entidades trocadas: a recarga completa grava de novo
+            if base.caminho is not None:
+                _apaga_armazens()
+            return None
+        derivados.descarta_meses(base.versao, ENTIDADE_GRUPO, ano, [MESES[mes - 1] for mes in meses])
+    if base.caminho is not None:
+        if not os.path.exists(f'{base.caminho}.npy'):
+            # Nenhum mes mudou: o armazem atual e gravado com o nome da chave nova
+            base.armazem.grava(base.caminho)
+        _apaga_armazens(base.caminho)
+    return base
+
+
+def vigia_planilhas(lista_planilhas, intervalo=5.0):
+    '''
+    Funcao inicia, uma unica vez por processo, a thread que confere as planilhas a cada intervalo (mtime e tamanho)
+    e aplica a carga incremental assim que um arquivo muda, antes da proxima sessao pedir os dados.
+    input: funcao sem argumentos que retorna a lista de planilhas e intervalo em segundos
+    output: thread de vigia
+    '''
+    global _vigia
+    with _trava:
+        if _vigia is not None and _vigia.is_alive():
+            return _vigia
+
+        def vigia():
+            while True:
+                time.sleep(intervalo)
+                try:
+                    carrega_base(lista_planilhas())
+                except Exception:
+                    # Planilha sendo gravada ou incompleta (zip invalido, aba faltando): tenta de novo no proximo ciclo
+                    continue
+
+        _vigia = threading.Thread(target=vigia, name='vigia_planilhas', daemon=True)
+        _vigia.start()
+        return _vigia
@@ -0,0 +1,85 @@
+import threading
+from collections import OrderedDict
+
+
+class Pendente:
+    '''Valor guardado no cache que so e carregado no primeiro obtem (ex: entrada de um instantaneo em disco).'''
+
+    def __init__(self, carrega):
+        self.carrega = carrega
+
+
+class CacheLRU:
+    '''
+    Cache LRU limitado e seguro entre threads, compartilhado pelas sessoes do Streamlit.
+    Quando passa do tamanho maximo descarta a entrada usada ha mais tempo.
+    '''
+
+    def __init__(self, tamanho=64):
+        self.tamanho = tamanho
+        self._dados = OrderedDict()
+        self._trava = threading.Lock()
+
+    def obtem(self, chave, calcula):
+        '''
+        Funcao retorna o valor da chave, calculando com calcula() apenas quando nao esta no cache.
+        input: chave (hashable) e funcao sem argumentos que gera o valor
+        output: valor guardado (um Pendente e carregado e trocado pelo valor)
+        '''
+        with self._trava:
+            if chave in self._dados:
+                self._dados.move_to_end(chave)
+                valor = self._dados[chave]
+                if not isinstance(valor, Pendente):
+                    return valor
+                calcula = valor.carrega
+
+        # O calculo fica fora da trava para nao bloquear as outras sessoes
+        valor = calcula()
+        self.guarda(chave, valor)
+        return valor
+
+    def consulta(self, chave):
+        # Valor ja calculado da chave, sem calcular nem mudar a ordem de uso (None se ausente ou pendente)
+        with self._trava:
+            valor = self._dados.get(chave)
+        return None if isinstance(valor, Pendente) else valor
+
+    def guarda(self, chave, valor):
+        # Valor calculado fora do cache (ex: lido de um instantaneo em disco)
+        with self._trava:
+            self._dados[chave] = valor
+            self._dados.move_to_end(chave)
+            while len(self._dados) > self.tamanho:
+                self._dados.popitem(last=False)
+
+    def entradas(self, predicado):
+        '''
+        Funcao retorna as entradas cuja chave atende o predicado, sem alterar a ordem de uso.
+        input: funcao que recebe a chave e retorna True para incluir
+        output: lista de tuplas (chave, valor)
+        '''
+        with self._trava:
+            return [(chave, valor) for chave, valor in self._dados.items() if predicado(chave)]
+
+    def descarta(self, predicado):
+        '''
+        Funcao remove do cache apenas as entradas cuja chave atende o predicado.
+        input: funcao que recebe a chave e retorna True para descartar
+        output: quantidade de entradas removidas
+        '''
+        with self._trava:
+            chaves = [chave for chave in self._dados if predicado(chave)]
+            for chave in chaves:
+                del self._dados[chave]
+        return len(chaves)
+
+    def limpa(self):
+        with self._trava:
+            self._dados.clear()
+
+    def __len__(self):
+        return len(self._dados)
+
+    def __contains__(self, chave):
+        return chave in self._dados
@@ -0,0 +1,83 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from dre.hierarquia import limpa_nome
+
+
+def remove_zeradas(dataframe):
+    '''
+    Funcao remove de uma vez as colunas cuja soma e zero (inclusive as totalmente vazias).
+    input: dataframe numerico
+    output: dataframe sem as colunas zeradas
+    '''
+    totais = np.nansum(dataframe.to_numpy(dtype='float64'), axis=0)
+    return dataframe.loc[:, totais != 0]
+
+
+def limpa_nomes(dataframe):
+    # Substitui o clean_names do pyjanitor: mesmos nomes, sem carregar o pyjanitor e suas dependencias
+    return dataframe.rename(columns=limpa_nome)
+
+
+def remove_vazias(dataframe):
+    # Substitui o remove_empty do pyjanitor: remove linhas e colunas totalmente vazias
+    return dataframe.dropna(how='all').dropna(axis=1, how='all')
+
+
+def adiciona_perc(dataframe, remover_zeradas=False):
+    '''
+    Funcao cria as colunas perc_<coluna> (valor / total da coluna) montando valores e percentuais em um unico bloco NumPy,
+    sem inserir coluna a coluna no dataframe.
+    input: dataframe numerico e remover_zeradas (True remove antes as colunas de soma zero)
+    output: dataframe com as colunas originais seguidas das colunas perc_
+    '''
+    valores = dataframe.to_numpy(dtype='float64')
+    totais = np.nansum(valores, axis=0)
+    colunas = dataframe.columns
+    if remover_zeradas:
+        manter = totais != 0
+        valores, totais, colunas = valores[:, manter], totais[manter], colunas[manter]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        percentuais = valores / totais
+
+    return pd.DataFrame(np.hstack([valores, percentuais]), index=dataframe.index,
+                        columns=list(colunas) + [f'perc_{coluna}' for coluna in colunas])
+
+
+# Funcao cria colunas de percentual dos elementos da coluna em relacao ao proprio total
+def calc_perc(data, coluna):
+    return adiciona_perc(data[coluna])
+
+
+def calc_metricas(dataframe, colunas=None, mediana=False, quantis=()):
+    '''
+    Funcao calcula as metricas Melhor:max, Pior:min, Media:mean e STD:std (e opcionalmente mediana e quantis)
+    de todas as colunas de uma vez sobre o bloco NumPy, ignorando valores vazios como o pandas.
+    input: dataframe, lista de colunas (None = colunas numericas que nao sao perc_), mediana (True/False) e quantis (ex: (0.25, 0.75))
+    output: dataframe numerico com uma linha por coluna
+    '''
+    if colunas is None:
+        colunas = [coluna for coluna in dataframe.select_dtypes('number').columns if not str(coluna).startswith('perc_')]
+    valores = dataframe[list(colunas)].to_numpy(dtype='float64')
+
+    # Colunas vazias ou com um unico mes geram NaN, sem os avisos do NumPy
+    with warnings.catch_warnings(), np.errstate(divide='ignore', invalid='ignore'):
+        warnings.simplefilter('ignore', RuntimeWarning)
+        metricas = {'Melhor': np.nanmax(valores, axis=0, initial=-np.inf, where=~np.isnan(valores)),
+                    'Pior': np.nanmin(valores, axis=0, initial=np.inf, where=~np.isnan(valores)),
+                    'Media': np.nanmean(valores, axis=0),
+                    'STD': np.nanstd(valores, axis=0, ddof=1)}
+        if mediana:
+            metricas['Mediana'] = np.nanmedian(valores, axis=0)
+        if len(quantis):
+            for q, valor in zip(quantis, np.nanquantile(valores, quantis, axis=0)):
+                metricas[f'Q{q * 100:g}'] = valor
+
+    metricas = pd.DataFrame(metricas, index=list(colunas))
+    # max/min de coluna sem nenhum valor ficam vazios, como no pandas
+    vazias = np.isnan(valores).all(axis=0)
+    metricas.loc[vazias, ['Melhor', 'Pior']] = np.nan
+    return metricas
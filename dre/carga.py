@@ -0,0 +1,158 @@
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from dre.medicao import mede
+
+# Dependencia opcional: sem pyarrow a planilha continua sendo lida, apenas sem o arquivo auxiliar parquet
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+MESES = ['Jan', 'Fev', 'Mar', 'Abr', 'Mai', 'Jun', 'Jul', 'Ago', 'Set', 'Out', 'Nov', 'Dez']
+# Selecao inicial do filtro de meses da sidebar
+MESES_PADRAO = ['Jan', 'Fev', 'Mar']
+ARQUIVO_PADRAO = 'DRE_G.xlsx'
+ABA_PADRAO = 'DRE_dummy'
+
+# Cache do processo compartilhado entre todas as sessoes do Streamlit: chave -> (df, df_trans)
+_cache = {}
+_trava = threading.Lock()
+
+
+def chave_arquivo(caminho):
+    '''
+    Funcao retorna a chave que identifica a versao do arquivo (caminho absoluto, mtime e tamanho).
+    input: caminho do arquivo
+    output: tupla (caminho, mtime_ns, tamanho)
+    '''
+    info = os.stat(caminho)
+    return (os.path.abspath(caminho), info.st_mtime_ns, info.st_size)
+
+
+def caminho_auxiliar(caminho, aba):
+    # Arquivo parquet gravado ao lado da planilha, ex: DRE_G.xlsx -> DRE_G.DRE_dummy.parquet
+    raiz, _ = os.path.splitext(caminho)
+    return f'{raiz}.{aba}.parquet'
+
+
+def _marca(chave):
+    return f'{chave[1]}:{chave[2]}'.encode()
+
+
+def _le_auxiliar(caminho_pq, chave):
+    # So aproveita o parquet se ele foi gerado a partir da mesma versao da planilha
+    if pq is None or not os.path.exists(caminho_pq):
+        return None
+    try:
+        with mede('parquet_auxiliar'):
+            tabela = pq.read_table(caminho_pq)
+    except (OSError, pa.ArrowException):
+        return None
+    if (tabela.schema.metadata or {}).get(b'dre_chave') != _marca(chave):
+        return None
+    return tabela.to_pandas()
+
+
+def _grava_auxiliar(df, caminho_pq, chave):
+    if pq is None:
+        return
+    tabela = pa.Table.from_pandas(df)
+    tabela = tabela.replace_schema_metadata({**(tabela.schema.metadata or {}), b'dre_chave': _marca(chave)})
+    temporario = f'{caminho_pq}.{os.getpid()}.tmp'
+    try:
+        pq.write_table(tabela, temporario)
+        os.replace(temporario, caminho_pq)
+    except OSError:
+        # Diretorio somente leitura: segue apenas com o cache em memoria
+        if os.path.exists(temporario):
+            os.remove(temporario)
+
+
+def le_planilha(caminho=ARQUIVO_PADRAO, aba=ABA_PADRAO, meses=MESES):
+    '''
+    Funcao le a aba da DRE com openpyxl, indexada pela coluna Variaveis.
+    input: caminho da planilha, nome da aba e lista de meses
+    output: dataframe (linhas = contas, colunas = meses)
+    '''
+    # Meses ainda nao fechados podem nao existir na planilha
+    meses = set(meses)
+    with mede('read_excel'):
+        return pd.read_excel(caminho, sheet_name=aba, engine='openpyxl', index_col='Variaveis',
+                             usecols=lambda coluna: coluna == 'Variaveis' or coluna in meses)
+
+
+def transpoe(df):
+    '''
+    Funcao gera a df transposta com uma linha por mes e a coluna Mes.
+    input: dataframe da DRE (contas x meses)
+    output: dataframe (meses x contas)
+    '''
+    with mede('transpoe'):
+        df_trans = df.T.reset_index()
+        df_trans = df_trans.rename(columns={'index': 'Mes'})
+    return df_trans
+
+
+def carrega_dre(caminho=ARQUIVO_PADRAO, aba=ABA_PADRAO):
+    '''
+    Funcao carrega a DRE uma unica vez por versao do arquivo (caminho, mtime e tamanho).
+    Primeiro procura no cache do processo, depois no parquet auxiliar e so entao le a planilha com openpyxl.
+    Os dataframes retornados sao compartilhados entre sessoes e nao devem ser alterados.
+    input: caminho da planilha e nome da aba
+    output: tupla (df, df_trans)
+    '''
+    chave = chave_arquivo(caminho) + (aba,)
+    dados = _cache.get(chave)
+    if dados is not None:
+        return dados
+
+    with _trava:
+        # Outra sessao pode ter carregado enquanto esperavamos a trava
+        dados = _cache.get(chave)
+        if dados is not None:
+            return dados
+
+        return _guarda(chave, _le_com_auxiliar(caminho, aba, chave))
+
+
+def _le_com_auxiliar(caminho, aba, chave):
+    # Parquet auxiliar quando valido, senao a planilha (e grava o parquet para a proxima carga)
+    caminho_pq = caminho_auxiliar(caminho, aba)
+    df = _le_auxiliar(caminho_pq, chave)
+    if df is None:
+        df = le_planilha(caminho, aba)
+        _grava_auxiliar(df, caminho_pq, chave)
+    return df
+
+
+def _guarda(chave, df):
+    # Chamada com a trava: versoes antigas do mesmo arquivo deixam de ser uteis
+    dados = (df, transpoe(df))
+    for antiga in [c for c in _cache if c[0] == chave[0] and c[3] == chave[3]]:
+        del _cache[antiga]
+    _cache[chave] = dados
+    return dados
+
+
+def carrega_varias(planilhas, processos=None):
+    '''
+    Funcao carrega no cache do processo varias planilhas de uma vez, lendo em paralelo (pool de processos)
+    as que ainda nao estao no cache. Com uma unica planilha pendente le no proprio processo.
+    input: lista de tuplas (caminho, aba) e numero de processos (None = numero de CPUs)
+    output: None
+    '''
+    pendentes = [(caminho, aba, chave_arquivo(caminho) + (aba,)) for caminho, aba in planilhas]
+    pendentes = [pendente for pendente in pendentes if pendente[2] not in _cache]
+    if len(pendentes) < 2:
+        return
+    with ProcessPoolExecutor(max_workers=processos) as pool:
+        dfs = list(pool.map(_le_com_auxiliar, *zip(*pendentes)))
+    with _trava:
+        for (_, _, chave), df in zip(pendentes, dfs):
+            _guarda(chave, df)
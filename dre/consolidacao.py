@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+
+from dre.armazem import AUSENTE, NULO, para_decimais, zera_vazios
+from dre.carga import MESES
+
+# Entidade virtual com a soma das lojas do ano e planilha de eliminacoes (ex: dados/Eliminacoes_2022.xlsx)
+ENTIDADE_GRUPO = 'Consolidado'
+ENTIDADE_ELIMINACOES = 'Eliminacoes'
+
+
+def entidades_reais(entidades):
+    # Entidades que entram na soma do grupo (sem o proprio grupo e sem as eliminacoes)
+    return [entidade for entidade in entidades if entidade not in (ENTIDADE_GRUPO, ENTIDADE_ELIMINACOES)]
+
+
+def consolida(armazem, ano):
+    '''
+    Funcao soma as entidades do ano alinhadas pelo plano de contas e subtrai as eliminacoes, em centavos (exato).
+    Conta ausente em uma entidade conta como zero; o mes so entra no consolidado quando todas as entidades o tem.
+    input: Armazem da base e ano
+    output: dataframe (contas x meses Jan..Dez) ou None quando o ano tem menos de duas entidades
+    '''
+    do_ano = {entidade: i for (entidade, ano_bloco), i in armazem.blocos.items() if ano_bloco == ano}
+    lojas = entidades_reais(do_ano)
+    if len(lojas) < 2:
+        return None
+
+    blocos = armazem.centavos[[do_ano[loja] for loja in lojas]]
+    existe = blocos != AUSENTE
+    validos = blocos > AUSENTE
+    meses = np.flatnonzero(existe.any(axis=2).all(axis=0))
+    contas = existe.any(axis=(0, 1))
+    # Soma so dos valores preenchidos; conta/mes vazio em todas as lojas continua vazio (como sum(min_count=1))
+    soma = zera_vazios(blocos).sum(axis=0)
+    vazios = ~validos.any(axis=0)
+
+    if ENTIDADE_ELIMINACOES in do_ano:
+        eliminacoes = armazem.centavos[do_ano[ENTIDADE_ELIMINACOES]]
+        soma = soma - zera_vazios(eliminacoes)
+        # Eliminacao em conta/mes vazio nas lojas continua no consolidado (so a eliminacao, negativa)
+        vazios &= eliminacoes <= AUSENTE
+        contas |= (eliminacoes != AUSENTE).any(axis=0)
+
+    soma[vazios] = NULO
+    contas = np.flatnonzero(contas)
+    selecao = np.ix_(contas, meses)
+    return pd.DataFrame(para_decimais(soma.T[selecao]), index=pd.Index(armazem.contas[contas], name='Variaveis'),
+                        columns=[MESES[mes] for mes in meses])
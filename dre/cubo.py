@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+
+from dre.armazem import ESCALA, zera_vazios
+from dre.carga import MESES
+
+
+def trechos_continuos(meses):
+    '''
+    Funcao quebra uma selecao de meses em trechos continuos, ex: Jan, Fev, Mar, Jun -> [Jan..Mar], [Jun].
+    input: lista de meses (Jan..Dez)
+    output: tupla (inicios, fins) com as posicoes na soma acumulada (inicio exclusivo, fim inclusivo)
+    '''
+    numeros = np.unique([MESES.index(mes) + 1 for mes in meses]).astype(int)
+    if len(numeros) == 0:
+        return np.zeros(0, dtype=int), np.zeros(0, dtype=int)
+    quebras = np.flatnonzero(np.diff(numeros) != 1) + 1
+    inicios = numeros[np.r_[0, quebras]] - 1
+    fins = numeros[np.r_[quebras - 1, len(numeros) - 1]]
+    return inicios, fins
+
+
+class CuboMensal:
+    '''
+    Cubo [entidade/ano x mes x conta] com a soma acumulada dos meses de todas as contas, em centavos (int64, exata).
+    O total de qualquer selecao de meses sai de uma subtracao por trecho continuo (um trimestre ou o acumulado
+    do ano sao uma unica subtracao), sem somar os meses um a um.
+    '''
+
+    def __init__(self, base):
+        armazem = base.armazem
+        self.contas = armazem.contas
+        self.blocos = dict(armazem.blocos)
+        # Meses e contas sem valor entram como zero, igual ao sum() do pandas
+        self.acumulado = np.zeros((len(self.blocos), len(MESES) + 1, len(self.contas)), dtype=np.int64)
+        np.cumsum(zera_vazios(armazem.centavos), axis=1, out=self.acumulado[:, 1:, :])
+
+    def atualiza_bloco(self, base, entidade, ano):
+        '''
+        Funcao recalcula no lugar a soma acumulada de uma unica entidade/ano apos a base receber meses novos ou alterados,
+        sem copiar o cubo: o custo e o de um bloco, qualquer que seja o numero de entidades e anos.
+        input: BaseDRE ja atualizada, entidade e ano
+        output: None
+        '''
+        # O bloco novo e calculado fora do cubo e copiado de uma vez. So uma leitura em andamento da mesma entidade/ano
+        # pode pegar a copia pela metade, e ela e da versao anterior dos meses (a versao muda depois dos dados): o
+        # resultado fica na chave antiga do cache, que nenhuma selecao nova usa. Os outros blocos nao mudam.
+        bloco = np.cumsum(zera_vazios(base.armazem.bloco(entidade, ano)), axis=0)
+        self.acumulado[self.blocos[(entidade, ano)], 1:, :] = bloco
+
+    def totais(self, entidade, ano, meses):
+        '''
+        Funcao retorna o total de todas as contas nos meses selecionados.
+        input: entidade, ano e lista de meses
+        output: serie indexada pelo nome da conta
+        '''
+        acumulado = self.acumulado[self.blocos[(entidade, ano)]]
+        inicios, fins = trechos_continuos(meses)
+        totais = acumulado[fins].sum(axis=0) - acumulado[inicios].sum(axis=0)
+        return pd.Series(totais / ESCALA, index=self.contas)
+
+    def totais_entidades(self, entidades, ano, meses):
+        '''
+        Funcao retorna o total de todas as contas de varias entidades do ano de uma vez (uma subtracao por trecho para todos os blocos).
+        input: lista de entidades, ano e lista de meses
+        output: dataframe (entidades x contas)
+        '''
+        acumulado = self.acumulado[[self.blocos[(entidade, ano)] for entidade in entidades]]
+        inicios, fins = trechos_continuos(meses)
+        totais = acumulado[:, fins].sum(axis=1) - acumulado[:, inicios].sum(axis=1)
+        return pd.DataFrame(totais / ESCALA, index=pd.Index(entidades, name='entidade'), columns=self.contas)
+
+    def percentual_rob(self, entidade, ano, meses, conta_rob='Receita Operacional Bruta'):
+        '''
+        Funcao retorna o percentual de todas as contas sobre a ROB nos meses selecionados.
+        input: entidade, ano, lista de meses e nome da conta de ROB
+        output: serie indexada pelo nome da conta
+        '''
+        totais = self.totais(entidade, ano, meses)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return totais / totais[conta_rob]
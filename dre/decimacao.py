@@ -0,0 +1,67 @@
+import numpy as np
+
+
+def eixo_numerico(x, tamanho):
+    '''
+    Funcao converte o eixo x em numeros para o calculo das areas: datas viram nanossegundos e categorias
+    (ex: nomes dos meses) viram a posicao do ponto.
+    input: array do eixo x (ou None) e numero de pontos
+    output: array float64
+    '''
+    if x is None:
+        return np.arange(tamanho, dtype='float64')
+    x = np.asarray(x)
+    if np.issubdtype(x.dtype, np.datetime64):
+        return x.astype('datetime64[ns]').astype('int64').astype('float64')
+    if np.issubdtype(x.dtype, np.number):
+        return x.astype('float64')
+    return np.arange(tamanho, dtype='float64')
+
+
+def lttb(x, y, pontos):
+    '''
+    Funcao escolhe os pontos que preservam a forma da serie pelo Largest-Triangle-Three-Buckets:
+    primeiro e ultimo pontos fixos e, em cada faixa intermediaria, o ponto que forma o maior triangulo
+    com o ponto escolhido na faixa anterior e a media da faixa seguinte.
+    Varias series com o mesmo eixo x (linhas 2D) sao decimadas juntas, cada uma com os seus indices.
+    input: eixo x (array ou None), valores y (1D ou 2D series x pontos) e numero de pontos desejado
+    output: indices escolhidos, com o mesmo numero de dimensoes de y
+    '''
+    y = np.asarray(y, dtype='float64')
+    unica = y.ndim == 1
+    y = np.nan_to_num(np.atleast_2d(y))
+    series, tamanho = y.shape
+    if pontos >= tamanho or pontos < 3:
+        indices = np.broadcast_to(np.arange(tamanho), (series, tamanho))
+        return indices[0] if unica else indices
+
+    x = eixo_numerico(x, tamanho)
+    # pontos - 2 faixas entre o primeiro e o ultimo ponto; limites[i]:limites[i + 1] e a faixa i
+    limites = np.linspace(1, tamanho - 1, pontos - 1).astype(np.int64)
+    inicios = limites[:-1]
+    larguras = np.diff(limites)
+    # Media de cada faixa seguinte (a da ultima faixa e o proprio ultimo ponto), calculadas de uma vez
+    seguintes = np.r_[limites[1:], tamanho - 1]
+    soma_x = np.add.reduceat(x, seguintes[:-1])[:-1]
+    soma_y = np.add.reduceat(y, seguintes[:-1], axis=1)[:, :-1]
+    media_x = np.r_[soma_x / larguras[1:], x[-1]]
+    media_y = np.c_[soma_y / larguras[1:], y[:, -1]]
+    # Janelas das faixas em uma matriz (faixas x largura maxima); faixas menores repetem o primeiro ponto,
+    # que o argmax nunca escolhe no lugar do original
+    deslocamentos = np.arange(larguras.max())
+    janelas = np.where(deslocamentos < larguras[:, None], inicios[:, None] + deslocamentos, inicios[:, None])
+    x_janelas = x[janelas]
+    y_janelas = y[:, janelas]
+
+    indices = np.empty((series, pontos), dtype=np.int64)
+    indices[:, 0] = 0
+    indices[:, -1] = tamanho - 1
+    linhas = np.arange(series)
+    anterior = np.zeros(series, dtype=np.int64)
+    # So a escolha depende da faixa anterior: o laco faz uma conta de areas por faixa para todas as series
+    for faixa in range(pontos - 2):
+        xa, ya = x[anterior][:, None], y[linhas, anterior][:, None]
+        areas = np.abs((xa - media_x[faixa]) * (y_janelas[:, faixa] - ya) - (xa - x_janelas[faixa]) * (media_y[:, faixa:faixa + 1] - ya))
+        anterior = janelas[faixa, areas.argmax(axis=1)]
+        indices[:, faixa + 1] = anterior
+    return indices[0] if unica else indices
@@ -0,0 +1,330 @@
+from collections.abc import Mapping
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+from dre.cache import CacheLRU
+from dre.calculos import adiciona_perc, calc_metricas, remove_zeradas
+from dre.carga import MESES
+from dre.consolidacao import ENTIDADE_GRUPO
+from dre.incremental import AgregadoMeses
+from dre.medicao import mede
+from dre.tabelas import COLUNAS_POR_PAGINA, janela
+from dre.variacoes import maiores_variacoes, periodos_referencia, variacoes_entidade
+
+CONTAS_PRINCIPAIS = ['Receita Operacional Bruta', 'Deduções Da Receita Operacional Bruta', 'Receita Operacional Liquida', 'Custo Das Vendas',
+                     'Margem de Contribuição 1', 'Margem de Contribuição 2', 'Ebitda', 'Despesa com Escritório', 'Resultado Operacional',
+                     '(+/-) Resultado Financeiro Líquido', 'Resultado Antes do Imposto', 'Resultado Gerencial do Período']
+
+CONTAS_ROB = ['Receita Operacional Bruta', '1.1 - Vendas de mercadorias', '1.2 - Prestação De Serviços', '1.3 – Pacotes']
+
+# Frames derivados: (versao da base, entidade, ano, meses, nome do frame) -> dataframe (tambem totais, metricas e figuras)
+_cache = CacheLRU(tamanho=512)
+
+
+class FramesSelecao(Mapping):
+    '''
+    Dicionario preguicoso com os dataframes das abas para uma selecao (entidade, ano e meses).
+    Cada dataframe so e calculado quando alguma aba pede por ele, e fica no cache LRU do processo.
+    A ordem dos meses na selecao nao importa (chave com frozenset).
+    Os dataframes sao compartilhados entre sessoes e nao devem ser alterados.
+    '''
+
+    def __init__(self, base, entidade, ano, meses, orcamento=None):
+        self.base = base
+        self.orcamento = orcamento
+        self.plano = base.plano
+        self.entidade = entidade
+        self.ano = ano
+        self.meses = list(meses)
+        self.chave = chave_selecao(base, entidade, ano, self.meses)
+
+    def __getitem__(self, nome):
+        calcula = CALCULOS[nome]
+
+        def mede_calculo():
+            with mede(f'frame:{nome}'):
+                return calcula(self)
+
+        return _cache.obtem(self.chave + (nome,), mede_calculo)
+
+    def totais(self):
+        '''
+        Funcao retorna o total consolidado de todas as contas nos meses selecionados a partir do cubo de somas acumuladas.
+        output: serie indexada pelo nome da conta
+        '''
+        return _cache.obtem(self.chave + ('totais',), lambda: self.base.cubo.totais(self.entidade, self.ano, self.meses))
+
+    def kpis(self, contas=None):
+        '''
+        Funcao retorna o total consolidado e o percentual sobre a ROB das contas nos meses selecionados.
+        input: lista declarativa de contas (None = CONTAS_PRINCIPAIS)
+        output: dataframe indexado pelo nome da conta com as colunas Total e Perc_ROB
+        '''
+        contas = tuple(CONTAS_PRINCIPAIS if contas is None else contas)
+
+        def calcula():
+            totais = self.totais()
+            selecionadas = self.plano.seleciona(contas)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                return pd.DataFrame({'Total': totais[selecionadas], 'Perc_ROB': totais[selecionadas] / totais['Receita Operacional Bruta']})
+
+        return _cache.obtem(self.chave + ('kpis', contas), calcula)
+
+    def participacoes(self, contas):
+        '''
+        Funcao retorna, para o Consolidado, o total de cada entidade nas contas e a participacao (perc_) na soma das lojas.
+        input: lista declarativa de contas
+        output: dataframe indexado pela entidade (vazio fora do Consolidado)
+        '''
+        contas = tuple(contas)
+
+        def calcula():
+            if self.entidade != ENTIDADE_GRUPO:
+                return pd.DataFrame()
+            return self.base.participacoes(self.ano, self.meses, self.plano.seleciona(contas))
+
+        return _cache.obtem(self.chave + ('participacoes', contas), calcula)
+
+    def cascata(self, conta=None):
+        '''
+        Funcao retorna as etapas da cascata na selecao com os valores dos totais do cubo (uma consulta para todas as contas).
+        input: conta a detalhar (None = cascata principal de ROB ate o RGP, ver PlanoContas.cascata)
+        output: dataframe com as colunas conta, valor e medida, na ordem da cascata
+        '''
+        def calcula():
+            etapas = pd.DataFrame(self.plano.cascata(conta), columns=['conta', 'medida'])
+            etapas.insert(1, 'valor', self.totais()[etapas['conta']].to_numpy())
+            return etapas
+
+        return _cache.obtem(self.chave + ('cascata', conta), calcula)
+
+    def variacoes(self):
+        '''
+        Funcao retorna as variacoes de todas as contas na selecao: MoM, YoY e orcado (ver dre.variacoes).
+        output: dataframe indexado pela conta com as colunas de dre.variacoes.MEDIDAS
+        '''
+        return _cache.obtem(self._chave_variacoes(), lambda: variacoes_entidade(self.base, self.entidade, self.ano, self.meses, self.orcamento))
+
+    def maiores_variacoes(self, contas, comparacao, quantidade=10):
+        '''
+        Funcao retorna as contas analiticas com as maiores variacoes absolutas na comparacao.
+        input: lista declarativa de contas, comparacao ('MoM', 'YoY' ou 'Orcamento') e quantidade de contas
+        output: dataframe ordenado pela variacao absoluta
+        '''
+        chave = self._chave_variacoes() + ('maiores', repr(contas), comparacao, quantidade)
+        return _cache.obtem(chave, lambda: maiores_variacoes(self.variacoes(), self.plano, contas, comparacao, quantidade))
+
+    def _chave_variacoes(self):
+        # Os meses de referencia (mes e ano anteriores) e a versao do orcamento tambem entram na chave
+        referencias = tuple(self.base.versao_meses(self.entidade, ano, meses) for ano, meses in periodos_referencia(self.ano, self.meses).values())
+        return self.chave + ('variacoes', referencias, None if self.orcamento is None else self.orcamento.versao)
+
+    def janela(self, nome, indice=None, filtro='', ordena=None, decrescente=False, percentuais=True, pagina=0, tamanho=COLUNAS_POR_PAGINA):
+        '''
+        Funcao retorna a janela visivel (pagina de colunas, filtrada e ordenada) de um dos frames da selecao, ja em Arrow.
+        input: nome do frame e parametros de dre.tabelas.janela
+        output: tupla (janela, total de colunas filtradas)
+        '''
+        chave = self.chave + ('janela', nome, indice, filtro, ordena, decrescente, percentuais, pagina, tamanho)
+        return _cache.obtem(chave, lambda: janela(self[nome], indice, filtro, ordena, decrescente, percentuais, pagina, tamanho))
+
+    def agregado(self):
+        '''
+        Funcao retorna a soma, contagem e soma dos quadrados por conta nos meses selecionados (ver dre.incremental).
+        Se a selecao difere de uma selecao ja calculada por um unico mes, o agregado dela e atualizado com esse mes
+        em O(contas); senao e calculado a partir dos meses selecionados.
+        output: AgregadoMeses
+        '''
+        def calcula():
+            bloco = self.base.armazem.bloco(self.entidade, self.ano)
+            numeros = {MESES.index(mes) + 1 for mes in self.meses}
+            for mes in range(1, len(MESES) + 1):
+                vizinha = [MESES[numero - 1] for numero in sorted(numeros ^ {mes})]
+                anterior = _cache.consulta(chave_selecao(self.base, self.entidade, self.ano, vizinha) + ('agregado',))
+                if isinstance(anterior, AgregadoMeses):
+                    with mede('agregado:incremental'):
+                        return anterior.alterna(bloco, mes)
+            with mede('agregado'):
+                return AgregadoMeses.calcula(bloco, numeros)
+
+        return _cache.obtem(self.chave + ('agregado',), calcula)
+
+    def metricas(self, nome, colunas=None, mediana=False, quantis=()):
+        '''
+        Funcao retorna as metricas (Melhor, Pior, Media, STD e opcionais) das colunas de um dos frames da selecao.
+        Sem mediana/quantis e com as colunas ligadas a contas do plano, as metricas saem do agregado incremental;
+        senao sao calculadas sobre o frame (calc_metricas).
+        input: nome do frame, lista de colunas (None = todas as contas do frame), mediana e quantis
+        output: dataframe numerico com uma linha por coluna
+        '''
+        chave = self.chave + ('metricas', nome, None if colunas is None else tuple(colunas), mediana, tuple(quantis))
+        def calcula():
+            with mede(f'metricas:{nome}'):
+                df = self[nome]
+                contas = None if mediana or len(quantis) else self._contas_colunas(nome)
+                selecionadas = list(colunas) if colunas is not None else \
+                    [coluna for coluna in df.select_dtypes('number').columns if not str(coluna).startswith('perc_')]
+                if contas is not None and all(coluna in contas for coluna in selecionadas):
+                    posicoes = self.base.armazem.contas.get_indexer([contas[coluna] for coluna in selecionadas])
+                    if not (posicoes < 0).any():
+                        return self.agregado().metricas(posicoes, selecionadas)
+                return calc_metricas(df, colunas, mediana, quantis)
+
+        return _cache.obtem(chave, calcula)
+
+    def _contas_colunas(self, nome):
+        # Conta do plano de cada coluna do frame (None = frame sem todos os meses da selecao ou nao declarativo)
+        calcula = CALCULOS[nome]
+        if calcula is _df_meses_selecionados:
+            return {conta: conta for conta in self.plano.contas}
+        if isinstance(calcula, Quadro) and not calcula.remover_meses_zerados:
+            return calcula.contas_colunas(self.plano)
+        return None
+
+    def figuras(self, bloco):
+        '''
+        Funcao retorna as figuras de um bloco de grafico do painel, montadas uma vez por selecao.
+        As figuras sao compartilhadas entre sessoes e nao devem ser alteradas.
+        input: bloco com monta(frames) (ver dre.painel.Grafico); a chave e o repr da dataclass
+        output: lista de figuras plotly
+        '''
+        return _cache.obtem(self.chave + ('figuras', repr(bloco)), lambda: bloco.monta(self))
+
+    def __iter__(self):
+        return iter(CALCULOS)
+
+    def __len__(self):
+        return len(CALCULOS)
+
+
+def deriva_frames(base, entidade, ano, meses, orcamento=None):
+    '''
+    Funcao retorna os dataframes das abas para a selecao, calculados sob demanda e guardados no cache.
+    input: BaseDRE, entidade, ano, lista de meses selecionados e BaseDRE do orcamento (None = sem orcamento)
+    output: FramesSelecao (acesso por nome, ex: frames['df_ebitda'])
+    '''
+    return FramesSelecao(base, entidade, ano, meses, orcamento)
+
+
+def chave_selecao(base, entidade, ano, meses):
+    '''
+    Funcao retorna a chave do cache de uma selecao; a ordem dos meses nao importa.
+    A versao de cada mes entra na chave: um mes reprocessado so invalida as selecoes que o contem.
+    input: BaseDRE, entidade, ano e lista de meses
+    output: tupla (versao da base, entidade, ano, frozenset dos meses, versoes dos meses)
+    '''
+    return (base.versao, entidade, ano, frozenset(meses), base.versao_meses(entidade, ano, meses))
+
+
+def descarta_meses(versao, entidade, ano, meses):
+    '''
+    Funcao remove do cache os frames, totais e metricas das selecoes da entidade/ano que contem algum dos meses.
+    input: versao da base, entidade, ano e lista de meses alterados
+    output: quantidade de entradas removidas
+    '''
+    meses = set(meses)
+    return _cache.descarta(lambda chave: chave[:3] == (versao, entidade, ano) and not meses.isdisjoint(chave[3]))
+
+
+def _df_meses_selecionados(frames):
+    return frames.base.fatia(frames.entidade, frames.ano, frames.meses)
+
+
+@dataclass
+class Quadro:
+    '''
+    Definicao declarativa de um frame derivado: contas (ver PlanoContas.seleciona), apelidos por codigo
+    (ou nomes limpos), remocao de colunas/meses zerados, colunas perc_ e a coluna de mes.
+    Executada sobre df_meses_selecionados, sempre na mesma ordem:
+    selecao -> nomes -> colunas zeradas -> meses zerados -> percentuais -> mes -> extras.
+    '''
+    contas: list
+    apelidos: dict = field(default_factory=dict)
+    nomes_limpos: bool = False
+    remover_zeradas: bool = False
+    remover_meses_zerados: bool = False
+    percentuais: bool = False
+    # Nome da coluna de mes (None = sem coluna de mes) e se ela vem antes das contas
+    mes: str = None
+    mes_no_inicio: bool = False
+    # Colunas repetidas no final, {coluna: conta}, ex: {'ROB': 'Receita Operacional Bruta'}
+    extras: dict = field(default_factory=dict)
+
+    def contas_colunas(self, plano):
+        '''
+        Funcao retorna a conta do plano de cada coluna de valores do frame (contas renomeadas e extras).
+        input: PlanoContas
+        output: dicionario {coluna: conta} ou None se dois nomes coincidem
+        '''
+        nomes = plano.limpo if self.nomes_limpos else plano.apelidos(self.apelidos)
+        contas = plano.seleciona(self.contas)
+        colunas = {nomes.get(conta, conta): conta for conta in contas}
+        colunas.update({coluna: plano.conta(conta) for coluna, conta in self.extras.items()})
+        return colunas if len(colunas) == len(contas) + len(self.extras) else None
+
+    def __call__(self, frames):
+        plano = frames.plano
+        df_meses_selecionados = frames['df_meses_selecionados']
+        df = df_meses_selecionados[plano.seleciona(self.contas)]
+        with mede('nomes_limpos' if self.nomes_limpos else 'apelidos'):
+            df = df.rename(columns=plano.limpo if self.nomes_limpos else plano.apelidos(self.apelidos))
+        with mede('remove_zeradas'):
+            if self.remover_zeradas:
+                df = remove_zeradas(df)
+            if self.remover_meses_zerados:
+                df = df[~(df == 0).all(axis=1)]
+        with mede('percentuais'):
+            df = adiciona_perc(df) if self.percentuais else df.copy()
+        if self.mes is not None:
+            if self.mes_no_inicio:
+                df.insert(0, self.mes, df_meses_selecionados['Mes'])
+            else:
+                df[self.mes] = df_meses_selecionados['Mes']
+        for coluna, conta in self.extras.items():
+            df[coluna] = df_meses_selecionados[plano.conta(conta)]
+        return df
+
+
+# Frames das abas da DRE
+QUADROS = {
+    # Principais indicadores e percentuais
+    'df_perc': Quadro(CONTAS_PRINCIPAIS, percentuais=True, mes='Mes'),
+    'df_metricas': Quadro(CONTAS_ROB, percentuais=True),
+    # ROL: ROB, deducoes do grupo 2 e ROL
+    'df_rol': Quadro(['Receita Operacional Bruta', 'subgrupo:2', 'Receita Operacional Liquida'], mes='Mes', mes_no_inicio=True,
+                     apelidos={'Receita Operacional Bruta': 'ROB', '2.1': 'Imposto_venda', '2.1.1': 'COFINS', '2.1.3': 'ICMS', '2.1.4': 'ISS',
+                               '2.1.5': 'Simples', '2.2': 'devol_vendas', '2.3': 'desc_abat', 'Receita Operacional Liquida': 'ROL'}),
+    # MC1: custo das vendas (grupo 4)
+    'df_mc1': Quadro(['Receita Operacional Bruta', 'grupo:4', 'Margem de Contribuição 1'], mes='Mes', mes_no_inicio=True,
+                     apelidos={'Receita Operacional Bruta': 'ROB', '4': 'Custo_Vendas', '4.1': 'Custo_Mercadoria', '4.3': 'Perdas_Estoque',
+                               'Margem de Contribuição 1': 'MC1'}),
+    # MC2: outros custos variaveis (grupo 6) sem as colunas zeradas
+    'df_mc2': Quadro(['grupo:6', 'Margem de Contribuição 2'], remover_zeradas=True, mes='Mes', extras={'ROB': 'Receita Operacional Bruta'},
+                     apelidos={'6': 'Outros', '6.1': 'Comis_vendas', '6.2': 'taxa_cartao', '6.4': 'taxa_franq', '6.5': 'esforco_mark',
+                               '6.6': 'esforco_mark_prom', '6.6.1': 'midia_reg', '6.6.2': 'midia_loc', '6.6.3': 'amostras', '6.6.4': 'flaconetes',
+                               '6.6.5': 'eventos', '6.6.8': 'brindes', '6.7': 'embalagem', 'Margem de Contribuição 2': 'MC2'}),
+    # EBITDA: despesas operacionais (grupo 8) com os nomes limpos, sem zeradas e com percentuais
+    'df_ebitda': Quadro(['grupo:8', 'Ebitda'], nomes_limpos=True, remover_zeradas=True, percentuais=True, mes='mes'),
+    # ROP: resultado operacional, resultado financeiro (10), depreciacao (11) e nao operacionais (12)
+    'df_res_op': Quadro(['Resultado Operacional', 'grupo:10', 'grupo:11', 'grupo:12'], nomes_limpos=True, remover_zeradas=True, percentuais=True, mes='mes'),
+    # RAI e RGP: removendo meses zerados
+    'df_rai': Quadro(['Ebitda', 'Despesa com Escritório', 'Resultado Operacional', 'Resultado Antes do Imposto'], nomes_limpos=True,
+                     remover_meses_zerados=True, percentuais=True, mes='mes'),
+    'df_rgp': Quadro(['Resultado Antes do Imposto', '14', 'Resultado Gerencial do Período'], nomes_limpos=True,
+                     remover_meses_zerados=True, percentuais=True, mes='mes'),
+}
+
+
+# Registro dos frames derivados: nome -> funcao (ou Quadro) que calcula a partir da selecao
+CALCULOS = {'df_meses_selecionados': _df_meses_selecionados, **QUADROS}
+
+
+def registra_quadro(nome, quadro):
+    '''
+    Funcao registra um frame derivado novo (ex: de uma secao customizada), disponivel como frames[nome].
+    input: nome do frame e Quadro (ou funcao que recebe a selecao)
+    output: None
+    '''
+    CALCULOS[nome] = quadro
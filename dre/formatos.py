@@ -0,0 +1,77 @@
+import numpy as np
+
+from dre.cache import CacheLRU
+
+# Separadores (milhar, decimal) por localidade
+LOCALIDADES = {'br': ('.', ','), 'en': (',', '.')}
+# Tabela de troca a partir do formato do Python (',' milhar e '.' decimal)
+_TROCAS = {localidade: str.maketrans({',': milhar, '.': decimal}) for localidade, (milhar, decimal) in LOCALIDADES.items()}
+
+# Textos ja formatados por (bytes do array, formato): os mesmos totais e metricas voltam a cada rerun
+_cache = CacheLRU(tamanho=1024)
+
+
+def _formata(valores, casas, percentual, localidade, vazio):
+    # Formata a coluna inteira com o format do Python (mesmo arredondamento) e troca os separadores
+    # de uma vez so no texto concatenado, em vez de tres replace por valor
+    molde = f'{{:,.{casas}%}}' if percentual else f'{{:,.{casas}f}}'
+    texto = '\n'.join(map(molde.format, valores.ravel().tolist()))
+    textos = np.array(texto.translate(_TROCAS[localidade]).split('\n'), dtype=object).reshape(valores.shape)
+    textos[~np.isfinite(valores)] = vazio
+    return textos
+
+
+def formata(valores, casas=2, percentual=False, localidade='br', vazio=''):
+    '''
+    Funcao formata um array ou coluna inteira de numeros em uma unica passada vetorizada, com cache pelos valores.
+    Ex (br): 1234567.891 -> '1.234.567,89'; 0.1234 com percentual -> '12,34%'.
+    input: valores (array, lista ou serie), casas decimais, percentual (multiplica por 100 e adiciona %),
+           localidade ('br' ou 'en') e texto para vazios/infinitos
+    output: array de textos no mesmo formato dos valores
+    '''
+    valores = np.asarray(valores, dtype='float64')
+    chave = (valores.tobytes(), valores.shape, casas, percentual, localidade, vazio)
+    return _cache.obtem(chave, lambda: _formata(valores, casas, percentual, localidade, vazio))
+
+
+def formata_numero(valor, casas=2, percentual=False, localidade='br', vazio=''):
+    # Um unico valor (ex: card de total), pelo mesmo caminho e cache dos arrays
+    return formata([valor], casas, percentual, localidade, vazio)[0]
+
+
+def _percentuais(dataframe, percentuais):
+    # Colunas perc_ sao formatadas como percentual quando nao se informa a lista
+    if percentuais is None:
+        return [coluna for coluna in dataframe.columns if str(coluna).startswith('perc_')]
+    return list(percentuais)
+
+
+def formata_tabela(dataframe, casas=2, localidade='br', percentuais=None, vazio=''):
+    '''
+    Funcao gera a versao texto de um dataframe numerico, formatando coluna a coluna de forma vetorizada.
+    Usada em exportacoes; na tela prefira estilo(), que mantem os numeros.
+    input: dataframe, casas decimais, localidade, colunas percentuais (None = colunas perc_) e texto para vazios
+    output: dataframe de textos com o mesmo indice e colunas
+    '''
+    percentuais = set(_percentuais(dataframe, percentuais))
+    numericas = dataframe.select_dtypes('number').columns
+    textos = dataframe.astype(object).copy()
+    for coluna in numericas:
+        textos[coluna] = formata(dataframe[coluna], casas, coluna in percentuais, localidade, vazio)
+    return textos
+
+
+def estilo(dataframe, casas=2, localidade='br', percentuais=None, vazio=''):
+    '''
+    Funcao retorna o Styler do dataframe com os textos formatados de forma vetorizada (e em cache) para cada coluna.
+    Os valores continuam numericos (ordenacao e destaque como highlight_min funcionam); so a exibicao usa os textos.
+    input: dataframe, casas decimais, localidade, colunas percentuais (None = colunas perc_) e texto para vazios
+    output: pandas Styler
+    '''
+    percentuais = set(_percentuais(dataframe, percentuais))
+    formatos = {}
+    for coluna in dataframe.select_dtypes('number').columns:
+        serie = dataframe[coluna]
+        textos = formata(serie, casas, coluna in percentuais, localidade, vazio)
+        formatos[coluna] = dict(zip(serie.to_numpy(dtype='float64'), textos)).get
+    return dataframe.style.format(formatos, na_rep=vazio)
@@ -0,0 +1,223 @@
+import numpy as np
+
+from dre.cache import CacheLRU
+from dre.decimacao import lttb
+from dre.importacao import preguicoso
+from dre.medicao import mede
+
+# plotly so e importado no primeiro grafico montado (o plotly.express sozinho leva centenas de ms)
+px = preguicoso('plotly.express')
+go = preguicoso('plotly.graph_objects')
+sp = preguicoso('plotly.subplots')
+
+# Esqueletos das figuras (layout e tracos sem os dados) por definicao do grafico
+_moldes = CacheLRU(tamanho=256)
+
+# Campos de dados que mudam a cada selecao de meses; o resto do traco vem do esqueleto
+_CAMPOS_DADOS = ('x', 'y', 'customdata', 'values')
+
+# Series longas (dados diarios ou de varios anos): acima de PONTOS_POR_TRACO o traco e decimado no servidor (LTTB)
+# e a figura com mais de LIMITE_WEBGL pontos passa de scatter (SVG) para scattergl (WebGL).
+# Com 12 meses nada muda; o WebGL fica restrito as figuras grandes porque o navegador limita os contextos por pagina
+PONTOS_POR_TRACO = 1000
+LIMITE_WEBGL = 5000
+
+
+def _esqueleto(figura):
+    dicionario = figura.to_dict()
+    for traco in dicionario['data']:
+        for campo in _CAMPOS_DADOS:
+            traco.pop(campo, None)
+    return dicionario
+
+
+def _reduz(dados, de_linha, pontos=PONTOS_POR_TRACO):
+    '''
+    Funcao decima pelo LTTB os tracos de linha com mais de pontos valores de y; x e customdata seguem os mesmos indices,
+    entao o hover de percentual continua apontando para o ponto certo. Tracos com o mesmo eixo x sao decimados juntos.
+    input: lista de dicionarios {campo: array} por traco, lista de bool (traco e de linha) e pontos por traco
+    output: lista de dicionarios (a mesma lista quando nenhum traco passa do limite)
+    '''
+    grupos = {}
+    for i, (arrays, linha) in enumerate(zip(dados, de_linha)):
+        if linha and len(arrays.get('y', ())) > pontos:
+            grupos.setdefault((id(arrays.get('x')), len(arrays['y'])), []).append(i)
+    if not grupos:
+        return dados
+
+    reduzidos = list(dados)
+    for tracos in grupos.values():
+        indices = lttb(dados[tracos[0]].get('x'), np.vstack([dados[i]['y'] for i in tracos]), pontos)
+        for i, escolhidos in zip(tracos, indices):
+            reduzidos[i] = {campo: np.asarray(valores)[escolhidos] for campo, valores in dados[i].items()}
+    return reduzidos
+
+
+def _figura(chave, constroi, dados, ajusta_layout=None):
+    '''
+    Funcao retorna a figura da definicao (chave) com os dados da selecao atual.
+    Na primeira vez constroi a figura com plotly express/graph_objects e guarda o esqueleto;
+    nas seguintes so copia o esqueleto e troca os arrays de cada traco, sem revalidar a figura.
+    Series longas sao decimadas e figuras grandes usam scattergl (ver PONTOS_POR_TRACO e LIMITE_WEBGL).
+    input: chave da definicao, funcao que constroi a figura, lista de dicionarios {campo: array} por traco
+           e funcao que recebe o layout do esqueleto e retorna os campos que dependem dos dados
+    output: figura plotly
+    '''
+    construida = None
+
+    def cria():
+        nonlocal construida
+        with mede(f'figura_nova:{chave[0]}'):
+            construida = constroi()
+            return _esqueleto(construida)
+
+    esqueleto = _moldes.obtem(chave, cria)
+    # Decimacao e WebGL so nos tracos de linha (barras e pizza ficam como estao); o px.line ja pode ter escolhido scattergl
+    de_linha = [traco.get('type') in ('scatter', 'scattergl') for traco in esqueleto['data']]
+    reduzidos = _reduz(dados, de_linha)
+    webgl = sum(len(arrays.get('y', ())) for arrays, linha in zip(reduzidos, de_linha) if linha) > LIMITE_WEBGL
+    tipo = 'scattergl' if webgl else 'scatter'
+    # A figura recem construida tem a serie inteira e o tipo escolhido pelo plotly: so vale sem decimacao e no mesmo tipo
+    if construida is not None and reduzidos is dados and all(traco.type == tipo for traco, linha in zip(construida.data, de_linha) if linha):
+        return construida
+
+    with mede(f'figura:{chave[0]}'):
+        tracos = [{**traco, **arrays} for traco, arrays in zip(esqueleto['data'], reduzidos)]
+        tracos = [{**traco, 'type': tipo} if linha else traco for traco, linha in zip(tracos, de_linha)]
+        layout = esqueleto['layout']
+        if ajusta_layout is not None:
+            layout = {**layout, **ajusta_layout(layout)}
+        return go.Figure({'data': tracos, 'layout': layout}, _validate=False)
+
+
+def _congela(dicionario):
+    return tuple(sorted(dicionario.items())) if dicionario else None
+
+
+def linhas(dataframe, x, y, titulo=None, labels=None, legenda=None, mostra_legenda=True):
+    '''
+    Funcao retorna grafico de linhas (markers+lines) das colunas y em relacao a x com hover simultaneo.
+    input: dataframe, coluna x, lista de colunas y, titulo, labels do px, titulo da legenda e mostra_legenda
+    output: grafico plotly
+    '''
+    y = list(y)
+
+    def constroi():
+        figura = px.line(dataframe, x=x, y=y, title=titulo, labels=labels)
+        figura.update_traces(mode="markers+lines", hovertemplate=None)
+        figura.update_layout(hovermode="x unified")
+        if legenda is not None:
+            figura.update_layout(legend=dict(title=legenda))
+        if not mostra_legenda:
+            figura.update_layout(showlegend=False)
+        return figura
+
+    chave = ('linhas', x, tuple(y), titulo, _congela(labels), legenda, mostra_legenda)
+    eixo_x = dataframe[x].to_numpy()
+    return _figura(chave, constroi, [{'x': eixo_x, 'y': dataframe[coluna].to_numpy()} for coluna in y])
+
+
+def barras(dataframe, x, y, labels=None):
+    '''
+    Funcao retorna grafico de barras agrupadas das colunas y em relacao a x.
+    input: dataframe, coluna x, lista de colunas y e labels do px
+    output: grafico plotly
+    '''
+    y = list(y)
+    chave = ('barras', x, tuple(y), _congela(labels))
+    eixo_x = dataframe[x].to_numpy()
+    return _figura(chave, lambda: px.bar(dataframe, x=x, y=y, barmode='group', labels=labels),
+                   [{'x': eixo_x, 'y': dataframe[coluna].to_numpy()} for coluna in y])
+
+
+def pizza(valores, nomes, furo=0.5):
+    '''
+    Funcao retorna grafico de rosca com os valores e nomes informados.
+    input: lista de valores, lista de nomes e tamanho do furo
+    output: grafico plotly
+    '''
+    chave = ('pizza', tuple(nomes), furo)
+    return _figura(chave, lambda: px.pie(values=list(valores), names=list(nomes), hole=furo), [{'values': list(valores)}])
+
+
+def linha_media(dataframe, x, y, customdata, media, titulo_y):
+    '''
+    Funcao retorna grafico de linha da coluna y com hover de valor e percentual (customdata) e a linha tracejada da media.
+    input: dataframe, coluna x, coluna y, coluna com o percentual, valor da media e titulo do eixo y
+    output: grafico plotly
+    '''
+    def constroi():
+        figura = go.Figure()
+        # Linha da coluna analisada com hover mostrando valor e percentual
+        figura.add_trace(go.Scatter(x=dataframe[x], y=dataframe[y], mode='lines+markers', hovertemplate='Valor: %{y:,.2f}<br>Perc do Total: %{customdata:.2f}%<extra></extra>',
+                                    customdata=dataframe[customdata]))
+        # Linha da media
+        figura.add_shape(type='line', xref='paper', yref='y', x0=0, x1=1, y0=media, y1=media, line=dict(color='red', dash='dash'), name='Média')
+        figura.update_layout(xaxis_title='', yaxis_title=titulo_y, showlegend=False)
+        return figura
+
+    chave = ('linha_media', x, y, customdata, titulo_y)
+    dados = [{'x': dataframe[x].to_numpy(), 'y': dataframe[y].to_numpy(), 'customdata': dataframe[customdata].to_numpy()}]
+    # A linha da media e o unico item do layout que depende dos dados
+    return _figura(chave, constroi, dados, ajusta_layout=lambda layout: {'shapes': [{**layout['shapes'][0], 'y0': media, 'y1': media}]})
+
+
+def grade(dataframe, x, colunas, titulos, linhas_grade, colunas_grade, titulo, altura, largura, absoluto=False):
+    '''
+    Funcao retorna grade de subplots com um grafico de linha por coluna.
+    input: dataframe, coluna x, lista de colunas, titulos dos subplots, numero de linhas e colunas da grade,
+           titulo, altura, largura e absoluto (True plota o valor absoluto)
+    output: grafico plotly
+    '''
+    colunas = list(colunas)
+
+    def serie(coluna):
+        return abs(dataframe[coluna]) if absoluto else dataframe[coluna]
+
+    def constroi():
+        figura = sp.make_subplots(rows=linhas_grade, cols=colunas_grade, subplot_titles=list(titulos))
+        for i, coluna in enumerate(colunas):
+            figura.add_trace(go.Scatter(x=dataframe[x], y=serie(coluna), mode='lines+markers', line=go.scatter.Line()),
+                             row=i // colunas_grade + 1, col=i % colunas_grade + 1)
+        figura.update_layout(height=altura, width=largura, title_text=titulo, showlegend=False)
+        return figura
+
+    chave = ('grade', x, tuple(colunas), tuple(titulos), linhas_grade, colunas_grade, titulo, altura, largura, absoluto)
+    eixo_x = dataframe[x].to_numpy()
+    return _figura(chave, constroi, [{'x': eixo_x, 'y': serie(coluna).to_numpy()} for coluna in colunas])
+
+
+def cascata(rotulos, valores, medidas, titulo=None):
+    '''
+    Funcao retorna grafico em cascata: barras 'absolute' com o valor cheio (resultados) e 'relative' com a parcela
+    somada a partir da barra anterior.
+    input: lista de rotulos, lista de valores, lista de medidas ('absolute' ou 'relative') e titulo
+    output: grafico plotly
+    '''
+    rotulos, medidas = list(rotulos), list(medidas)
+
+    def constroi():
+        figura = go.Figure(go.Waterfall(x=rotulos, y=list(valores), measure=medidas, texttemplate='%{y:,.0f}',
+                                        connector=dict(line=dict(color='gray', dash='dot'))))
+        figura.update_layout(title=titulo, showlegend=False, xaxis_title='', yaxis_title='Valores')
+        return figura
+
+    chave = ('cascata', tuple(rotulos), tuple(medidas), titulo)
+    return _figura(chave, constroi, [{'x': rotulos, 'y': np.asarray(valores, dtype='float64')}])
+
+
+def aquece():
+    '''
+    Funcao importa o plotly e monta figuras descartaveis de cada tipo, carregando os validadores
+    que o plotly so importa no primeiro uso; chamada pelo aquecimento na subida do servidor.
+    output: None
+    '''
+    dados = {'x': [0, 1], 'y': [1, 2]}
+    px.line(dados, x='x', y='y')
+    px.bar(dados, x='x', y='y')
+    px.pie(values=[1, 2], names=['a', 'b'])
+    figura = sp.make_subplots(rows=1, cols=2)
+    figura.add_trace(go.Scatter(x=[0, 1], y=[1, 2], mode='lines+markers', line=go.scatter.Line()), row=1, col=1)
+    figura.add_shape(type='line', xref='paper', yref='y', x0=0, x1=1, y0=1, y1=1)
+    figura.to_dict()
+    go.Figure(go.Waterfall(x=['a', 'b'], y=[1, 2], measure=['absolute', 'relative'])).to_dict()
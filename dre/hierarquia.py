@@ -0,0 +1,154 @@
+import re
+import unicodedata
+
+# Codigo no inicio do nome da conta, ex: '8.4.1 - Salários' ou '1.3 – Pacotes'
+_PADRAO_CODIGO = re.compile(r'^\s*(\d+(?:\.\d+)*)\s*[-–]\s*')
+
+# Linhas de resultado sem codigo: soma das contas anteriores (os grupos de custo e despesa ja vem negativos)
+SUBTOTAIS = {
+    'Receita Operacional Liquida': ['Receita Operacional Bruta', 'Deduções Da Receita Operacional Bruta'],
+    'Margem de Contribuição 1': ['Receita Operacional Liquida', 'Custo Das Vendas'],
+    'Margem de Contribuição 2': ['Margem de Contribuição 1', 'Outros Custos Variáveis'],
+    'Ebitda': ['Margem de Contribuição 2', 'Despesas Operacionais'],
+    'Resultado Operacional': ['Ebitda', 'Despesa com Escritório'],
+    'Resultado Antes do Imposto': ['Resultado Operacional', '(+/-) Resultado Financeiro Líquido', 'Depreciação e Amortização',
+                                   '(+/-) Outras Receitas e Despesas não Operacionais'],
+    'Resultado Gerencial do Período': ['Resultado Antes do Imposto', 'Impostos sobre o Lucro'],
+}
+
+
+def limpa_nome(nome):
+    '''
+    Funcao gera o nome limpo da conta no mesmo formato do clean_names do pyjanitor.
+    Ex: '8.4.1.2 - 13º Salário' -> '8_4_1_2_13º_salario'
+    input: nome da conta
+    output: string
+    '''
+    nome = unicodedata.normalize('NFD', str(nome).lower())
+    nome = ''.join(c for c in nome if not unicodedata.combining(c))
+    nome = re.sub(r"[ /:,?()\.-]", '_', nome)
+    nome = re.sub(r"['’]", '', nome).replace('\xa0', '_')
+    return re.sub('_+', '_', nome)
+
+
+def codigo_conta(nome):
+    '''
+    Funcao extrai o codigo da conta do nome, ex: '10.2.6 - IOF' -> '10.2.6'.
+    input: nome da conta
+    output: string com o codigo ou None para linhas de total sem codigo
+    '''
+    achado = _PADRAO_CODIGO.match(str(nome))
+    return achado.group(1) if achado else None
+
+
+class PlanoContas:
+    '''
+    Arvore do plano de contas montada uma unica vez a partir da ordem das linhas da DRE.
+    As contas com codigo penduram no prefixo do codigo (8.4.1 -> 8.4 -> 8); o primeiro nivel (8)
+    aponta para a linha de total sem codigo imediatamente anterior (Despesas Operacionais).
+    Grupos e filhos ficam pre calculados, entao as consultas por codigo sao O(1).
+    '''
+
+    def __init__(self, contas):
+        self.contas = list(contas)
+        self.ordem = {conta: i for i, conta in enumerate(self.contas)}
+        self.limpo = {conta: limpa_nome(conta) for conta in self.contas}
+        self.codigo = {conta: codigo_conta(conta) for conta in self.contas}
+        self.por_codigo = {}
+
+        total_anterior = None
+        for conta in self.contas:
+            codigo = self.codigo[conta]
+            if codigo is None:
+                total_anterior = conta
+                continue
+            raiz = codigo.split('.')[0]
+            if raiz not in self.por_codigo and total_anterior is not None:
+                self.por_codigo[raiz] = total_anterior
+                self.codigo[total_anterior] = raiz
+            self.por_codigo.setdefault(codigo, conta)
+
+        self.pai = {}
+        self.filhos = {conta: [] for conta in self.contas}
+        for conta in self.contas:
+            codigo = self.codigo[conta]
+            if codigo is None or '.' not in codigo:
+                continue
+            pai = self.por_codigo.get(codigo.rsplit('.', 1)[0])
+            if pai is not None:
+                self.pai[conta] = pai
+                self.filhos[pai].append(conta)
+
+        # Grupo = conta + todos os descendentes, na ordem da DRE
+        self._grupos = {}
+        for conta in reversed(self.contas):
+            self._grupos[conta] = [conta] + [d for filho in self.filhos[conta] for d in self._grupos[filho]]
+
+    def conta(self, codigo):
+        '''
+        Funcao retorna o nome da conta pelo codigo ('8.4') ou o proprio nome para totais sem codigo.
+        input: codigo ou nome da conta
+        output: nome da conta
+        '''
+        return self.por_codigo.get(codigo, codigo)
+
+    def grupo(self, codigo, raiz=True):
+        '''
+        Funcao retorna a conta e todos os descendentes pelo prefixo do codigo.
+        input: codigo ou nome da conta e raiz (False exclui a propria conta)
+        output: lista de nomes de contas na ordem da DRE
+        '''
+        grupo = self._grupos[self.conta(codigo)]
+        return grupo if raiz else grupo[1:]
+
+    def seleciona(self, entradas):
+        '''
+        Funcao converte uma lista declarativa de contas em nomes de contas.
+        Cada entrada pode ser um codigo ou nome ('8.4', 'Ebitda'), 'grupo:8' (conta e descendentes),
+        'subgrupo:2' (so os descendentes), 'filhos:8' (so o primeiro nivel abaixo) ou uma sublista,
+        cujas contas sao juntadas na ordem da DRE.
+        input: lista de entradas
+        output: lista de nomes de contas
+        '''
+        contas = []
+        for entrada in entradas:
+            if isinstance(entrada, (list, tuple)):
+                contas += sorted(self.seleciona(entrada), key=self.ordem.get)
+                continue
+            tipo, _, codigo = entrada.partition(':')
+            if tipo == 'grupo':
+                contas += self.grupo(codigo)
+            elif tipo == 'subgrupo':
+                contas += self.grupo(codigo, raiz=False)
+            elif tipo == 'filhos':
+                contas += self.filhos[self.conta(codigo)]
+            else:
+                contas.append(self.conta(entrada))
+        return contas
+
+    def apelidos(self, apelidos):
+        '''
+        Funcao converte um dicionario {codigo: apelido} em {nome da conta: apelido} para uso no rename.
+        input: dicionario de apelidos por codigo
+        output: dicionario de apelidos por nome
+        '''
+        return {self.conta(codigo): apelido for codigo, apelido in apelidos.items()}
+
+    def cascata(self, conta=None):
+        '''
+        Funcao retorna as etapas da cascata. Sem conta: a ROB e, para cada linha de resultado de SUBTOTAIS,
+        as contas que entram nela seguidas do proprio resultado (ROB -> deducoes -> ROL -> ... -> RGP).
+        Com conta: os filhos da conta seguidos do total dela (detalhamento de uma etapa).
+        input: nome ou codigo da conta (None = cascata principal)
+        output: lista de tuplas (conta, medida), medida 'absolute' (valor cheio) ou 'relative' (parcela)
+        '''
+        if conta is not None:
+            conta = self.conta(conta)
+            return [(filho, 'relative') for filho in self.filhos[conta]] + [(conta, 'absolute')]
+        etapas = []
+        for resultado, parcelas in SUBTOTAIS.items():
+            # A primeira parcela e o resultado anterior, ja na cascata (so a ROB entra como parcela inicial)
+            if not etapas:
+                etapas.append((parcelas[0], 'absolute'))
+            etapas += [(parcela, 'relative') for parcela in parcelas[1:]] + [(resultado, 'absolute')]
+        return [(conta, medida) for conta, medida in etapas if conta in self.ordem]
@@ -0,0 +1,36 @@
+import importlib
+
+
+class ModuloPreguicoso:
+    '''
+    Modulo importado so no primeiro acesso a um atributo (ex: px.line), fora do caminho da inicializacao.
+    Dependencias pesadas como o plotly.express deixam de pesar no import do pacote e do script.
+    '''
+
+    def __init__(self, nome):
+        self._nome = nome
+        self._modulo = None
+
+    def __getattr__(self, atributo):
+        if self._modulo is None:
+            self._modulo = importlib.import_module(self._nome)
+        return getattr(self._modulo, atributo)
+
+    def __repr__(self):
+        estado = 'carregado' if self._modulo is not None else 'nao carregado'
+        return f'<modulo preguicoso {self._nome} ({estado})>'
+
+
+def preguicoso(nome):
+    # Ex: px = preguicoso('plotly.express')
+    return ModuloPreguicoso(nome)
+
+
+def importa(nomes):
+    '''
+    Funcao importa de uma vez uma lista de modulos (ex: no aquecimento, antes do primeiro grafico).
+    input: lista de nomes de modulos
+    output: None
+    '''
+    for nome in nomes:
+        importlib.import_module(nome)
@@ -0,0 +1,94 @@
+'''
+Agregados incrementais da selecao de meses: soma, contagem e soma dos quadrados de cada conta (e maximo/minimo),
+guardados no cache por selecao. Quando o usuario liga ou desliga um unico mes, o agregado da selecao vizinha
+(que ja esta no cache) e atualizado com aquele mes em O(contas), sem refazer as contas dos outros meses; media, desvio
+padrao, melhor e pior mes de todas as contas saem do agregado. Totais e percentuais continuam vindo do cubo de somas
+acumuladas, tambem em O(contas) por selecao.
+'''
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from dre.armazem import para_decimais
+
+
+class AgregadoMeses:
+    '''
+    Soma, contagem e soma dos quadrados por conta dos meses selecionados de uma entidade/ano, com maximo e minimo.
+    As somas sao deslocadas por uma referencia fixa por conta (o primeiro mes usado na criacao), o que evita
+    perder precisao na variancia de valores grandes com pouca variacao. Imutavel: alterna retorna um agregado novo.
+    '''
+
+    def __init__(self, meses, referencia, soma, contagem, quadrados, maximo, minimo):
+        self.meses = frozenset(meses)
+        self.referencia = referencia
+        self.soma = soma
+        self.contagem = contagem
+        self.quadrados = quadrados
+        self.maximo = maximo
+        self.minimo = minimo
+
+    @classmethod
+    def calcula(cls, bloco, meses):
+        '''
+        Funcao calcula o agregado do zero a partir do bloco da entidade/ano.
+        input: bloco do armazem [mes x conta] em centavos e conjunto com o numero dos meses (1 a 12)
+        output: AgregadoMeses
+        '''
+        valores = para_decimais(bloco[sorted(mes - 1 for mes in meses)])
+        referencia = np.nan_to_num(valores[0]) if len(valores) else np.zeros(bloco.shape[1])
+        desvios = valores - referencia
+        with warnings.catch_warnings():
+            # Conta sem nenhum valor nos meses: maximo/minimo ficam NaN
+            warnings.simplefilter('ignore', RuntimeWarning)
+            maximo = np.nanmax(valores, axis=0) if len(valores) else np.full(bloco.shape[1], np.nan)
+            minimo = np.nanmin(valores, axis=0) if len(valores) else np.full(bloco.shape[1], np.nan)
+        return cls(meses, referencia, np.nansum(desvios, axis=0), (~np.isnan(valores)).sum(axis=0),
+                   np.nansum(desvios ** 2, axis=0), maximo, minimo)
+
+    def alterna(self, bloco, mes):
+        '''
+        Funcao retorna o agregado com o mes incluido (se nao estava) ou removido (se estava), em O(contas).
+        Na remocao, so as contas em que o mes era o maximo ou o minimo voltam aos outros meses.
+        input: bloco do armazem [mes x conta] em centavos e numero do mes (1 a 12)
+        output: AgregadoMeses
+        '''
+        valores = para_decimais(bloco[mes - 1])
+        presentes = ~np.isnan(valores)
+        desvios = np.where(presentes, valores - self.referencia, 0)
+        sinal = -1 if mes in self.meses else 1
+        meses = self.meses ^ {mes}
+        soma = self.soma + sinal * desvios
+        contagem = self.contagem + sinal * presentes
+        quadrados = self.quadrados + sinal * desvios ** 2
+
+        if sinal == 1:
+            maximo = np.fmax(self.maximo, valores)
+            minimo = np.fmin(self.minimo, valores)
+        else:
+            maximo, minimo = self.maximo.copy(), self.minimo.copy()
+            refazer = presentes & ((valores == self.maximo) | (valores == self.minimo))
+            if refazer.any():
+                restantes = para_decimais(bloco[np.ix_(sorted(m - 1 for m in meses), np.flatnonzero(refazer))])
+                with warnings.catch_warnings():
+                    warnings.simplefilter('ignore', RuntimeWarning)
+                    maximo[refazer] = np.nanmax(restantes, axis=0) if len(restantes) else np.nan
+                    minimo[refazer] = np.nanmin(restantes, axis=0) if len(restantes) else np.nan
+        return AgregadoMeses(meses, self.referencia, soma, contagem, quadrados, maximo, minimo)
+
+    def metricas(self, posicoes, nomes):
+        '''
+        Funcao retorna Melhor, Pior, Media e STD (ddof=1) das contas, como o calc_metricas sobre os meses selecionados.
+        input: posicao das contas no armazem e nomes das linhas (colunas do frame)
+        output: dataframe numerico com uma linha por conta
+        '''
+        contagem = self.contagem[posicoes]
+        soma = self.soma[posicoes]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            media = self.referencia[posicoes] + soma / contagem
+            variancia = np.maximum(self.quadrados[posicoes] - soma ** 2 / contagem, 0) / (contagem - 1)
+        variancia[contagem < 2] = np.nan
+        media[contagem == 0] = np.nan
+        return pd.DataFrame({'Melhor': self.maximo[posicoes], 'Pior': self.minimo[posicoes], 'Media': media, 'STD': np.sqrt(variancia)},
+                            index=list(nomes))
@@ -0,0 +1,258 @@
+'''
+Instantaneos dos periodos padrao (trimestres, semestres, ano e acumulado do ano) de cada entidade: um passo offline
+calcula os frames, KPIs, metricas e figuras de todas as secoes e grava um arquivo compactado por selecao
+(tabelas em parquet e figuras em JSON dentro de um zip). No dashboard, a selecao de meses igual a um periodo padrao
+carrega o instantaneo direto no cache da selecao; selecoes avulsas continuam calculadas sob demanda.
+
+O instantaneo guarda a assinatura dos dados e das secoes de onde saiu: planilha alterada (ou secoes.json diferente)
+deixa o instantaneo sem efeito ate o proximo passo offline, nunca mostra numeros antigos.
+
+Uso: python -m dre.instantaneos [diretorio das planilhas] [--saida instantaneos] [--secoes secoes.json]
+'''
+import argparse
+import ast
+import hashlib
+import io
+import json
+import os
+import re
+import sys
+import zipfile
+
+import numpy as np
+import pandas as pd
+
+from dre import derivados
+from dre.base import DIRETORIO_DADOS, carrega_base, lista_planilhas
+from dre.cache import CacheLRU, Pendente
+from dre.carga import MESES, chave_arquivo
+from dre.consolidacao import ENTIDADE_GRUPO
+from dre.derivados import QUADROS, deriva_frames
+from dre.importacao import preguicoso
+from dre.medicao import mede
+
+# Dependencia opcional: sem pyarrow as tabelas nao vao para parquet e os instantaneos ficam desligados
+try:
+    import pyarrow  # noqa: F401
+except ImportError:
+    pyarrow = None
+
+go = preguicoso('plotly.graph_objects')
+pio = preguicoso('plotly.io')
+
+DIRETORIO_INSTANTANEOS = os.environ.get('DRE_INSTANTANEOS', 'instantaneos')
+# Versao do formato do arquivo; muda quando o conteudo gravado muda
+FORMATO = 1
+
+PERIODOS = {
+    'T1': MESES[0:3], 'T2': MESES[3:6], 'T3': MESES[6:9], 'T4': MESES[9:12],
+    'S1': MESES[0:6], 'S2': MESES[6:12],
+    'Ano': MESES,
+}
+
+# Selecoes ja conferidas no processo: chave da selecao + versao do arquivo -> instantaneo aplicado (True/False)
+_conferidas = CacheLRU(tamanho=256)
+
+
+def periodos(disponiveis):
+    '''
+    Funcao retorna os periodos padrao com todos os meses disponiveis, mais o acumulado do ano (Jan ate o ultimo mes
+    seguido disponivel) quando ele nao coincide com um periodo padrao.
+    input: lista de meses disponiveis da entidade no ano
+    output: dicionario {nome do periodo: lista de meses}
+    '''
+    disponiveis = set(disponiveis)
+    resultado = {nome: meses for nome, meses in PERIODOS.items() if disponiveis.issuperset(meses)}
+    seguidos = next((i for i, mes in enumerate(MESES) if mes not in disponiveis), len(MESES))
+    if seguidos and set(MESES[:seguidos]) not in [set(meses) for meses in resultado.values()]:
+        resultado['Acumulado'] = MESES[:seguidos]
+    return resultado
+
+
+def caminho_instantaneo(diretorio, entidade, ano, meses):
+    # Um arquivo por selecao, nomeado pelos meses: ex: instantaneos/Loja_Centro_2022_Jan-Mar.zip
+    entidade = re.sub(r'[^\w.-]+', '_', entidade)
+    numeros = sorted(MESES.index(mes) for mes in meses)
+    return os.path.join(diretorio, f'{entidade}_{ano}_{MESES[numeros[0]]}-{MESES[numeros[-1]]}.zip')
+
+
+def assinatura(base, entidade, ano, meses, secoes):
+    '''
+    Funcao resume os dados da selecao e as definicoes das secoes em um hash: um instantaneo so vale para a mesma assinatura.
+    No Consolidado entram todas as entidades do ano (participacoes de cada loja).
+    input: BaseDRE, entidade, ano, lista de meses e dicionario {nome da aba: Secao}
+    output: texto hexadecimal
+    '''
+    armazem = base.armazem
+    entidades = sorted(ent for ent, ano_bloco in armazem.blocos if ano_bloco == ano) if entidade == ENTIDADE_GRUPO else [entidade]
+    numeros = sorted(MESES.index(mes) for mes in meses)
+    resumo = hashlib.sha1(f'{FORMATO}|{entidade}|{ano}|{sorted(meses)}'.encode())
+    for ent in entidades:
+        # Meses da entidade em centavos, direto da matriz do armazem
+        resumo.update(ent.encode())
+        resumo.update(np.ascontiguousarray(armazem.bloco(ent, ano)[numeros]).tobytes())
+    # Plano de contas na ordem da base e definicoes dos frames e blocos (dataclasses com repr estavel)
+    resumo.update(repr((base.contas, QUADROS, secoes)).encode())
+    return resumo.hexdigest()
+
+
+def _grava_tabela(arquivo, nome, tabela):
+    buffer = io.BytesIO()
+    tabela.to_parquet(buffer)
+    arquivo.writestr(nome, buffer.getvalue())
+
+
+def _le_tabela(arquivo, nome):
+    return pd.read_parquet(io.BytesIO(arquivo.read(nome)))
+
+
+def gera_instantaneo(base, entidade, ano, meses, secoes, diretorio=DIRETORIO_INSTANTANEOS):
+    '''
+    Funcao calcula todas as secoes da selecao (painel.prepara) e grava no zip o que ficou no cache da selecao:
+    frames, totais, KPIs, participacoes e metricas em parquet e as figuras de cada bloco em JSON.
+    input: BaseDRE, entidade, ano, lista de meses, dicionario {nome da aba: Secao} e diretorio de saida
+    output: caminho do arquivo gravado
+    '''
+    from dre import painel
+
+    frames = deriva_frames(base, entidade, ano, meses)
+    for secao in secoes.values():
+        try:
+            painel.prepara(secao, frames)
+        except Exception:
+            # Secao que nao se aplica aos dados (ex: contas ausentes) falha tambem no dashboard; o que ja foi
+            # calculado entra no instantaneo e o resto segue sob demanda
+            continue
+
+    tamanho = len(frames.chave)
+    entradas = derivados._cache.entradas(lambda chave: chave[:tamanho] == frames.chave)
+    manifesto = {'formato': FORMATO, 'entidade': entidade, 'ano': ano, 'meses': list(meses),
+                 'assinatura': assinatura(base, entidade, ano, meses, secoes), 'entradas': []}
+    os.makedirs(diretorio, exist_ok=True)
+    caminho = caminho_instantaneo(diretorio, entidade, ano, meses)
+    temporario = f'{caminho}.tmp'
+    with zipfile.ZipFile(temporario, 'w', compression=zipfile.ZIP_DEFLATED) as arquivo:
+        for i, (chave, valor) in enumerate(entradas):
+            entrada = {'chave': repr(chave[tamanho:]), 'arquivo': f'{i}'}
+            if isinstance(valor, list):
+                entrada['tipo'] = 'figuras'
+                arquivo.writestr(f'{i}.json', json.dumps([pio.to_json(figura, validate=False) for figura in valor]))
+            elif isinstance(valor, pd.Series):
+                entrada.update(tipo='serie', nome=valor.name)
+                _grava_tabela(arquivo, f'{i}.parquet', valor.to_frame('valor'))
+            elif isinstance(valor, pd.DataFrame):
+                entrada['tipo'] = 'tabela'
+                _grava_tabela(arquivo, f'{i}.parquet', valor)
+            else:
+                # Janelas de tabelas paginadas (dependem do filtro da sessao) e agregados saem rapido do frame
+                continue
+            manifesto['entradas'].append(entrada)
+        arquivo.writestr('manifesto.json', json.dumps(manifesto))
+    # Troca atomica: o dashboard nunca le um zip pela metade
+    os.replace(temporario, caminho)
+    return caminho
+
+
+def gera_instantaneos(base, secoes, diretorio=DIRETORIO_INSTANTANEOS):
+    '''
+    Funcao grava os instantaneos de todos os periodos padrao de cada entidade e ano da base.
+    input: BaseDRE, dicionario {nome da aba: Secao} e diretorio de saida
+    output: lista de caminhos gravados
+    '''
+    caminhos = []
+    for entidade in base.entidades():
+        for ano in base.anos(entidade):
+            for meses in periodos(base.meses(entidade, ano)).values():
+                caminhos.append(gera_instantaneo(base, entidade, ano, meses, secoes, diretorio))
+                # As entradas ja foram para o disco; o cache do processo nao precisa guardar todas as selecoes
+                derivados._cache.limpa()
+    return caminhos
+
+
+def _le_entrada(conteudo, entrada):
+    # Entrada do zip (ja em memoria) convertida no valor do cache: figuras plotly, serie ou dataframe
+    with zipfile.ZipFile(io.BytesIO(conteudo)) as arquivo:
+        if entrada['tipo'] == 'figuras':
+            figuras = json.loads(arquivo.read(f"{entrada['arquivo']}.json"))
+            return [go.Figure(json.loads(figura), _validate=False) for figura in figuras]
+        tabela = _le_tabela(arquivo, f"{entrada['arquivo']}.parquet")
+    if entrada['tipo'] == 'serie':
+        return tabela['valor'].rename(entrada['nome'])
+    return tabela
+
+
+def carrega_instantaneo(frames, secoes, diretorio=DIRETORIO_INSTANTANEOS):
+    '''
+    Funcao coloca o instantaneo da selecao no cache dos frames, quando existe e foi gerado dos mesmos dados e secoes.
+    O arquivo e lido uma vez; cada entrada so e convertida (parquet/figura) quando a aba pede por ela.
+    input: FramesSelecao, dicionario {nome da aba: Secao} e diretorio dos instantaneos
+    output: True se o instantaneo foi aplicado
+    '''
+    caminho = caminho_instantaneo(diretorio, frames.entidade, frames.ano, frames.meses)
+    if pyarrow is None or not os.path.exists(caminho):
+        return False
+    try:
+        with open(caminho, 'rb') as arquivo:
+            conteudo = arquivo.read()
+        with zipfile.ZipFile(io.BytesIO(conteudo)) as arquivo:
+            manifesto = json.loads(arquivo.read('manifesto.json'))
+        if (manifesto.get('formato') != FORMATO
+                or manifesto['assinatura'] != assinatura(frames.base, frames.entidade, frames.ano, frames.meses, secoes)):
+            return False
+        chaves = [frames.chave + ast.literal_eval(entrada['chave']) for entrada in manifesto['entradas']]
+    except (OSError, KeyError, ValueError, SyntaxError, zipfile.BadZipFile):
+        # Instantaneo corrompido ou de outra versao: a selecao e calculada normalmente
+        return False
+    for chave, entrada in zip(chaves, manifesto['entradas']):
+        derivados._cache.guarda(chave, Pendente(lambda entrada=entrada: _le_entrada(conteudo, entrada)))
+    return True
+
+
+def serve(frames, secoes, diretorio=DIRETORIO_INSTANTANEOS):
+    '''
+    Funcao aplica, uma vez por selecao, o instantaneo quando os meses selecionados sao um periodo padrao
+    (ou o acumulado do ano); nas reruns seguintes a selecao ja esta no cache.
+    input: FramesSelecao, dicionario {nome da aba: Secao} e diretorio dos instantaneos
+    output: True se a selecao veio de um instantaneo
+    '''
+    if not frames.meses:
+        return False
+    selecao = set(frames.meses)
+    if all(selecao != set(meses) for meses in periodos(frames.base.meses(frames.entidade, frames.ano)).values()):
+        return False
+    caminho = caminho_instantaneo(diretorio, frames.entidade, frames.ano, frames.meses)
+    if not os.path.exists(caminho):
+        return False
+
+    def aplica():
+        with mede('instantaneo'):
+            return carrega_instantaneo(frames, secoes, diretorio)
+
+    # A versao do arquivo entra na chave: instantaneo regravado com o servidor no ar e conferido de novo
+    return _conferidas.obtem(frames.chave + chave_arquivo(caminho), aplica)
+
+
+def main(argv=None):
+    from dre.painel import SECOES, carrega_secoes
+
+    parser = argparse.ArgumentParser(prog='python -m dre.instantaneos',
+                                     description='Grava os instantaneos dos periodos padrao (trimestres, semestres, ano e acumulado).')
+    parser.add_argument('diretorio', nargs='?', default=DIRETORIO_DADOS, help='diretorio com as planilhas <entidade>_<ano>.xlsx (sem ele, DRE_G.xlsx)')
+    parser.add_argument('--saida', default=DIRETORIO_INSTANTANEOS)
+    parser.add_argument('--secoes', default='secoes.json', help='secoes customizadas do dashboard (ignorado se nao existir)')
+    args = parser.parse_args(argv)
+    if pyarrow is None:
+        parser.error('os instantaneos precisam do pyarrow')
+
+    # Mesmas secoes e mesma base do dashboard, para a assinatura bater
+    secoes = dict(SECOES)
+    if os.path.exists(args.secoes):
+        secoes.update(carrega_secoes(args.secoes))
+    base = carrega_base(lista_planilhas(args.diretorio))
+    for caminho in gera_instantaneos(base, secoes, args.saida):
+        print(caminho)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
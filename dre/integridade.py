@@ -0,0 +1,128 @@
+'''
+Conferencia da hierarquia da DRE na carga: cada conta com filhos deve ser a soma dos filhos (8.4 Pessoal =
+8.4.1 + ... + 8.4.6) e cada linha de resultado a soma das suas parcelas (SUBTOTAIS, ex: ROL = ROB + deducoes).
+Todas as relacoes de todas as contas, meses e entidades sao conferidas de uma vez sobre a matriz em centavos
+do armazem (uma soma por grupo de componentes com np.add.reduceat); so as divergencias viram linhas do relatorio.
+
+Uso: python -m dre.integridade dados [--saida divergencias.csv] [--aba DRE_dummy] [--processos N]
+     saida 1 quando alguma relacao diverge
+'''
+import argparse
+import sys
+
+import numpy as np
+import pandas as pd
+
+from dre.armazem import AUSENTE, ESCALA, zera_vazios
+from dre.carga import ABA_PADRAO, MESES
+from dre.consolidacao import ENTIDADE_GRUPO
+from dre.hierarquia import SUBTOTAIS
+from dre.medicao import mede
+
+COLUNAS = ['entidade', 'ano', 'mes', 'conta', 'tipo', 'valor', 'soma_componentes', 'diferenca', 'sinal_invertido']
+
+
+def relacoes(plano):
+    '''
+    Funcao lista as relacoes conferidas: contas com filhos (tipo 'filhos') e linhas de resultado de SUBTOTAIS (tipo 'subtotal').
+    input: PlanoContas
+    output: lista de tuplas (conta, lista de componentes, tipo)
+    '''
+    lista = [(pai, filhos, 'filhos') for pai, filhos in plano.filhos.items() if filhos]
+    for resultado, parcelas in SUBTOTAIS.items():
+        parcelas = [parcela for parcela in parcelas if parcela in plano.ordem]
+        if resultado in plano.ordem and parcelas:
+            lista.append((resultado, parcelas, 'subtotal'))
+    return lista
+
+
+def confere(armazem, plano, tolerancia=0.0):
+    '''
+    Funcao confere todas as relacoes da hierarquia em todos os blocos entidade/ano e meses de uma vez.
+    Vazios somam como zero; mes ou conta ausente no bloco nao e conferido. Cada valor da planilha foi arredondado
+    para centavos, entao a diferenca so conta acima de (componentes + 1) / 2 centavos (vezes o numero de entidades
+    somadas no Consolidado) mais a tolerancia.
+    input: Armazem, PlanoContas e tolerancia adicional em reais
+    output: dataframe com uma linha por divergencia (COLUNAS); sinal_invertido marca conta = -soma dos componentes
+    '''
+    lista = relacoes(plano)
+    if not lista or not armazem.blocos:
+        return pd.DataFrame(columns=COLUNAS)
+    with mede('integridade'):
+        contas = armazem.contas
+        pais = contas.get_indexer([conta for conta, _, _ in lista])
+        tamanhos = np.array([len(componentes) for _, componentes, _ in lista])
+        componentes = contas.get_indexer([componente for _, lista_componentes, _ in lista for componente in lista_componentes])
+        inicios = np.r_[0, np.cumsum(tamanhos)[:-1]]
+
+        # [bloco x mes x relacao]: valor da conta e soma dos componentes, em centavos (exato)
+        valores = zera_vazios(armazem.centavos[:, :, pais])
+        somas = np.add.reduceat(zera_vazios(armazem.centavos[:, :, componentes]), inicios, axis=2)
+        diferencas = valores - somas
+        # O Consolidado soma os arredondamentos de todas as entidades do ano
+        entidades = np.ones(len(armazem.blocos))
+        for (entidade, ano), i in armazem.blocos.items():
+            if entidade == ENTIDADE_GRUPO:
+                entidades[i] = sum(1 for outra, outro_ano in armazem.blocos if outro_ano == ano and outra != ENTIDADE_GRUPO)
+        limites = entidades[:, None, None] * (tamanhos + 1) / 2 + tolerancia * ESCALA
+        divergentes = (armazem.centavos[:, :, pais] != AUSENTE) & (np.abs(diferencas) > limites)
+        blocos, meses, posicoes = np.nonzero(divergentes)
+
+        chaves = list(armazem.blocos)
+        valor, soma = valores[blocos, meses, posicoes], somas[blocos, meses, posicoes]
+        return pd.DataFrame({
+            'entidade': [chaves[i][0] for i in blocos],
+            'ano': [chaves[i][1] for i in blocos],
+            'mes': [MESES[i] for i in meses],
+            'conta': [lista[i][0] for i in posicoes],
+            'tipo': [lista[i][2] for i in posicoes],
+            'valor': valor / ESCALA,
+            'soma_componentes': soma / ESCALA,
+            'diferenca': (valor - soma) / ESCALA,
+            'sinal_invertido': (valor != 0) & (np.abs(valor + soma) <= limites[blocos, 0, posicoes]),
+        }, columns=COLUNAS)
+
+
+def resumo(divergencias):
+    '''
+    Funcao resume o relatorio por conta: quantas celulas divergem e a maior diferenca absoluta.
+    input: dataframe de confere
+    output: dataframe indexado por (conta, tipo) ordenado pela maior diferenca
+    '''
+    return (divergencias.assign(absoluta=divergencias['diferenca'].abs())
+            .groupby(['conta', 'tipo'], sort=False)
+            .agg(celulas=('absoluta', 'size'), maior_diferenca=('absoluta', 'max'), sinal_invertido=('sinal_invertido', 'sum'))
+            .sort_values('maior_diferenca', ascending=False))
+
+
+def main(argv=None):
+    # dre.base confere a hierarquia na carga e importa este modulo
+    from dre.base import BaseDRE, descobre_planilhas
+
+    parser = argparse.ArgumentParser(prog='python -m dre.integridade',
+                                     description='Confere se cada conta e a soma dos filhos e cada resultado a soma das parcelas.')
+    parser.add_argument('diretorio', help='diretorio com as planilhas <entidade>_<ano>.xlsx')
+    parser.add_argument('--saida', default=None, help='arquivo .csv ou .parquet com as divergencias')
+    parser.add_argument('--tolerancia', type=float, default=0.0, help='tolerancia adicional em reais')
+    parser.add_argument('--processos', type=int, default=None, help='processos do pool de leitura (padrao: numero de CPUs)')
+    parser.add_argument('--aba', default=ABA_PADRAO)
+    args = parser.parse_args(argv)
+
+    planilhas = descobre_planilhas(args.diretorio, args.aba)
+    if not planilhas:
+        parser.error(f'nenhuma planilha <entidade>_<ano>.xlsx em {args.diretorio}')
+    base = BaseDRE.de_planilhas(planilhas, args.processos)
+    divergencias = confere(base.armazem, base.plano, args.tolerancia)
+    if args.saida:
+        if args.saida.endswith('.parquet'):
+            divergencias.to_parquet(args.saida, index=False)
+        else:
+            divergencias.to_csv(args.saida, index=False)
+    print(f'{len(divergencias)} divergencias em {len(planilhas)} planilhas')
+    if len(divergencias):
+        print(resumo(divergencias).to_string())
+    return 1 if len(divergencias) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
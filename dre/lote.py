@@ -0,0 +1,108 @@
+'''
+Execucao em lote da DRE, sem Streamlit: para cada planilha <entidade>_<ano>.xlsx do diretorio calcula os KPIs
+consolidados (total e percentual sobre a ROB), os frames de todas as secoes e as metricas de cada frame,
+distribuindo as planilhas em um pool de processos. Cada tabela sai em um unico arquivo com as colunas entidade e ano.
+
+Uso: python -m dre.lote dados saida [--formato parquet|csv] [--processos N] [--meses Jan,Fev,Mar]
+'''
+import argparse
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from dre.base import BaseDRE, descobre_planilhas
+from dre.carga import ABA_PADRAO, MESES
+from dre.consolidacao import entidades_reais
+from dre.derivados import CALCULOS, deriva_frames
+
+
+def _identifica(df, entidade, ano):
+    df = df.copy()
+    df.insert(0, 'ano', ano)
+    df.insert(0, 'entidade', entidade)
+    return df
+
+
+def processa_planilha(planilha, meses=None):
+    '''
+    Funcao calcula KPIs, frames das secoes e metricas de uma planilha (executada em um processo do pool).
+    input: tupla (caminho, entidade, ano, aba) e lista de meses (None = todos os meses da planilha)
+    output: dicionario {nome da tabela: dataframe com as colunas entidade e ano}
+    '''
+    _, entidade, ano, _ = planilha
+    base = BaseDRE.de_planilhas([planilha])
+    disponiveis = base.meses(entidade, ano)
+    meses = disponiveis if meses is None else [mes for mes in meses if mes in disponiveis]
+    frames = deriva_frames(base, entidade, ano, meses)
+
+    tabelas = {'kpis': _identifica(frames.kpis().rename_axis('conta').reset_index(), entidade, ano)}
+    for nome in CALCULOS:
+        tabelas[nome] = _identifica(frames[nome], entidade, ano)
+        tabelas[f'metricas_{nome}'] = _identifica(frames.metricas(nome).rename_axis('conta').reset_index(), entidade, ano)
+    return tabelas
+
+
+def grava(tabela, caminho, formato):
+    # Nomes de contas sao textos; colunas inteiras ou mistas viram texto para o parquet
+    tabela.columns = [str(coluna) for coluna in tabela.columns]
+    if formato == 'parquet':
+        tabela.to_parquet(f'{caminho}.parquet', index=False)
+    else:
+        tabela.to_csv(f'{caminho}.csv', index=False)
+
+
+def processa_diretorio(diretorio, saida, formato='parquet', processos=None, meses=None, aba=ABA_PADRAO):
+    '''
+    Funcao processa todas as planilhas do diretorio no pool de processos e grava uma tabela por frame.
+    Planilhas com erro sao relatadas e nao interrompem o lote.
+    input: diretorio das planilhas, diretorio de saida, formato (parquet/csv), numero de processos, meses e aba
+    output: lista de tuplas (planilha, erro) das planilhas que falharam
+    '''
+    # A planilha de eliminacoes so faz sentido dentro do consolidado do dashboard
+    planilhas = [planilha for planilha in descobre_planilhas(diretorio, aba) if entidades_reais([planilha[1]])]
+    resultados = {}
+    falhas = []
+    with ProcessPoolExecutor(max_workers=processos) as pool:
+        futuros = [(planilha, pool.submit(processa_planilha, planilha, meses)) for planilha in planilhas]
+        for planilha, futuro in futuros:
+            try:
+                tabelas = futuro.result()
+            except Exception as erro:
+                falhas.append((planilha, erro))
+                continue
+            for nome, tabela in tabelas.items():
+                resultados.setdefault(nome, []).append(tabela)
+
+    os.makedirs(saida, exist_ok=True)
+    for nome, tabelas in resultados.items():
+        grava(pd.concat(tabelas, ignore_index=True), os.path.join(saida, nome), formato)
+    return falhas
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m dre.lote', description='Calcula a DRE de todas as planilhas <entidade>_<ano>.xlsx de um diretorio.')
+    parser.add_argument('diretorio', help='diretorio com as planilhas')
+    parser.add_argument('saida', help='diretorio onde as tabelas sao gravadas')
+    parser.add_argument('--formato', choices=['parquet', 'csv'], default='parquet')
+    parser.add_argument('--processos', type=int, default=None, help='processos do pool (padrao: numero de CPUs)')
+    parser.add_argument('--meses', default=None, help='meses separados por virgula, ex: Jan,Fev,Mar (padrao: todos)')
+    parser.add_argument('--aba', default=ABA_PADRAO)
+    args = parser.parse_args(argv)
+
+    meses = None
+    if args.meses:
+        meses = [mes.strip() for mes in args.meses.split(',')]
+        desconhecidos = [mes for mes in meses if mes not in MESES]
+        if desconhecidos:
+            parser.error(f'meses desconhecidos: {", ".join(desconhecidos)}')
+
+    falhas = processa_diretorio(args.diretorio, args.saida, args.formato, args.processos, meses, args.aba)
+    for (caminho, _, _, _), erro in falhas:
+        print(f'{caminho}: {erro}', file=sys.stderr)
+    return 1 if falhas else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,232 @@
+'''
+Instrumentacao de cada rerun do dashboard: tempo, memoria alocada e tamanho do payload enviado ao navegador
+por secao (aba) e etapa (read_excel, transposicao, frames, nomes limpos, colunas zeradas, figuras, st.dataframe...).
+Desligada por padrao: sem execucao ativa, mede() so testa uma variavel de contexto.
+'''
+import contextvars
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+# Dependencia opcional: sem pyarrow o payload das tabelas e estimado pelo memory_usage do pandas
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+# Execucao (rerun) em andamento na thread/sessao atual e secao corrente
+_execucao = contextvars.ContextVar('dre_execucao', default=None)
+_secao = contextvars.ContextVar('dre_secao', default='geral')
+
+# Agregado do processo por (secao, etapa): execucoes, segundos, bytes alocados e bytes de payload
+_agregado = {}
+_trava = threading.Lock()
+_ultima = {}
+# Execucoes em andamento em todas as sessoes: o tracemalloc fica ligado so enquanto ha alguma.
+# Execucao interrompida (excecao no rerun) sem descarta na mesma thread expira depois de EXPIRACAO segundos
+_ativas = set()
+EXPIRACAO = 600
+
+
+class Execucao:
+    '''Registros de um rerun; a pilha permite etapas aninhadas (ex: frame dentro do bloco da aba).'''
+
+    def __init__(self, rotulo):
+        self.rotulo = rotulo
+        self.inicio = time.perf_counter()
+        self.registros = []
+        self._pilha = []
+        self.tempo_total = None
+
+
+def ativa():
+    return _execucao.get() is not None
+
+
+def descarta():
+    # Rerun sem medicao (ou anterior interrompido por excecao)
+    _encerra(_execucao.get())
+    _execucao.set(None)
+
+
+def _encerra(execucao):
+    # Tira a execucao das ativas e desliga o tracemalloc quando nao sobra nenhuma (o rastreio deixa o processo 2-3x mais lento)
+    with _trava:
+        limite = time.perf_counter() - EXPIRACAO
+        _ativas.difference_update([ativa for ativa in _ativas if ativa is execucao or ativa.inicio < limite])
+        if not _ativas and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+
+def _unica(execucao):
+    # Memoria so e medida com uma unica execucao ativa: o tracemalloc e do processo e as outras sessoes mexeriam no pico
+    return len(_ativas) == 1 and execucao in _ativas and tracemalloc.is_tracing()
+
+
+def inicia_execucao(rotulo='rerun'):
+    '''
+    Funcao liga a medicao para o rerun atual. O tracemalloc fica ligado enquanto houver alguma execucao ativa
+    no processo e a memoria alocada so e registrada quando esta e a unica (com outras sessoes medindo ao mesmo
+    tempo, alocado_bytes fica 0).
+    input: rotulo do rerun
+    output: Execucao
+    '''
+    _encerra(_execucao.get())
+    execucao = Execucao(rotulo)
+    with _trava:
+        _ativas.add(execucao)
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+    _execucao.set(execucao)
+    return execucao
+
+
+def finaliza_execucao():
+    '''
+    Funcao fecha o rerun atual, soma os registros no agregado do processo e grava o OpenMetrics
+    no arquivo de DRE_METRICAS_ARQUIVO (quando definido), para coleta em producao.
+    output: Execucao finalizada ou None se a medicao nao estava ativa
+    '''
+    execucao = _execucao.get()
+    if execucao is None:
+        return None
+    execucao.tempo_total = time.perf_counter() - execucao.inicio
+    _execucao.set(None)
+    _encerra(execucao)
+
+    with _trava:
+        for registro in execucao.registros:
+            chave = (registro['secao'], registro['etapa'])
+            soma = _agregado.setdefault(chave, {'execucoes': 0, 'segundos': 0.0, 'alocado_bytes': 0, 'payload_bytes': 0})
+            soma['execucoes'] += 1
+            soma['segundos'] += registro['segundos']
+            soma['alocado_bytes'] += registro['alocado_bytes']
+            soma['payload_bytes'] += registro['payload_bytes']
+        _ultima['execucao'] = execucao
+
+    arquivo = os.environ.get('DRE_METRICAS_ARQUIVO')
+    if arquivo:
+        temporario = f'{arquivo}.{os.getpid()}.tmp'
+        with open(temporario, 'w', encoding='utf-8') as saida:
+            saida.write(exporta_openmetrics())
+        os.replace(temporario, arquivo)
+    return execucao
+
+
+@contextmanager
+def secao(nome):
+    # Etapas medidas dentro do bloco sao atribuidas a secao (aba)
+    token = _secao.set(nome)
+    try:
+        yield
+    finally:
+        _secao.reset(token)
+
+
+@contextmanager
+def mede(etapa):
+    '''
+    Funcao (context manager) mede tempo, memoria alocada (pico acima do inicio) e payload de uma etapa do rerun atual.
+    A memoria so e medida quando o rerun atual e a unica execucao ativa do processo (ver inicia_execucao).
+    input: nome da etapa
+    output: dicionario do registro (payload pode ser somado com payload())
+    '''
+    execucao = _execucao.get()
+    if execucao is None:
+        yield None
+        return
+
+    memoria = _unica(execucao)
+    atual, pico_anterior = tracemalloc.get_traced_memory() if memoria else (0, 0)
+    if memoria:
+        tracemalloc.reset_peak()
+    registro = {'secao': _secao.get(), 'etapa': etapa, 'segundos': 0.0, 'alocado_bytes': 0, 'payload_bytes': 0, '_pico_filhos': 0}
+    execucao._pilha.append(registro)
+    inicio = time.perf_counter()
+    try:
+        yield registro
+    finally:
+        registro['segundos'] = time.perf_counter() - inicio
+        # Outra sessao que comecou a medir durante a etapa tambem invalida o pico
+        memoria = memoria and _unica(execucao)
+        _, pico = tracemalloc.get_traced_memory() if memoria else (0, 0)
+        pico = max(pico, registro.pop('_pico_filhos'))
+        registro['alocado_bytes'] = max(pico - atual, 0) if memoria else 0
+        execucao._pilha.pop()
+        # O reset_peak apagou o pico da etapa de fora: ele volta pela pilha
+        if execucao._pilha:
+            pai = execucao._pilha[-1]
+            pai['_pico_filhos'] = max(pai['_pico_filhos'], pico, pico_anterior)
+        execucao.registros.append(registro)
+
+
+def tamanho_payload(objeto):
+    '''
+    Funcao estima os bytes que um objeto exibido manda ao navegador (figura em JSON, tabela em Arrow).
+    input: figura plotly, dataframe, Styler ou tabela pyarrow
+    output: inteiro com o tamanho em bytes
+    '''
+    if hasattr(objeto, 'to_plotly_json'):
+        import plotly.io as pio
+        return len(pio.to_json(objeto, validate=False))
+    if hasattr(objeto, 'data') and hasattr(objeto, 'to_html'):
+        objeto = objeto.data
+    if pa is not None and isinstance(objeto, pa.Table):
+        return objeto.nbytes
+    if pa is not None:
+        return pa.Table.from_pandas(objeto).nbytes
+    return int(objeto.memory_usage(deep=True).sum())
+
+
+def payload(objeto):
+    # Soma o payload do objeto na etapa aberta mais interna
+    execucao = _execucao.get()
+    if execucao is None or not execucao._pilha:
+        return
+    execucao._pilha[-1]['payload_bytes'] += tamanho_payload(objeto)
+
+
+def ultima_execucao():
+    return _ultima.get('execucao')
+
+
+def exporta_json(execucao=None):
+    '''
+    Funcao exporta o ultimo rerun (registros por etapa) e o agregado do processo em JSON.
+    input: Execucao (None = ultima finalizada)
+    output: texto JSON
+    '''
+    execucao = execucao or ultima_execucao()
+    with _trava:
+        agregado = [{'secao': s, 'etapa': e, **soma} for (s, e), soma in sorted(_agregado.items())]
+    dados = {'agregado': agregado}
+    if execucao is not None:
+        dados['execucao'] = {'rotulo': execucao.rotulo, 'segundos': execucao.tempo_total, 'registros': execucao.registros}
+    return json.dumps(dados, ensure_ascii=False, indent=2)
+
+
+def _rotulos(secao, etapa):
+    escapa = lambda texto: str(texto).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return f'{{secao="{escapa(secao)}",etapa="{escapa(etapa)}"}}'
+
+
+def exporta_openmetrics():
+    '''
+    Funcao exporta o agregado do processo no formato texto OpenMetrics (contadores por secao e etapa).
+    output: texto OpenMetrics terminado em # EOF
+    '''
+    metricas = [('dre_etapa_execucoes', 'execucoes', 'Execucoes da etapa'),
+                ('dre_etapa_segundos', 'segundos', 'Tempo total da etapa em segundos'),
+                ('dre_etapa_alocado_bytes', 'alocado_bytes', 'Memoria alocada pela etapa em bytes'),
+                ('dre_etapa_payload_bytes', 'payload_bytes', 'Payload enviado ao navegador em bytes')]
+    with _trava:
+        itens = sorted(_agregado.items())
+    linhas = []
+    for nome, campo, ajuda in metricas:
+        linhas += [f'# TYPE {nome} counter', f'# HELP {nome} {ajuda}.']
+        linhas += [f'{nome}_total{_rotulos(s, e)} {soma[campo]}' for (s, e), soma in itens]
+    linhas.append('# EOF')
+    return '\n'.join(linhas) + '\n'
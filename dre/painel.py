@@ -0,0 +1,504 @@
+import json
+import os
+import re
+from dataclasses import dataclass, field
+
+import streamlit as st
+
+from dre import graficos, medicao
+from dre.derivados import QUADROS, Quadro, registra_quadro
+from dre.formatos import LOCALIDADES, estilo, formata, formata_numero
+from dre.tabelas import COLUNAS_POR_PAGINA
+from dre.variacoes import COMPARACOES
+
+
+# Separadores de milhar/decimal padrao dos cards e tabelas do painel (ver dre.formatos.LOCALIDADES); cada sessao pode
+# trocar pela sidebar (chave 'localidade' do session_state)
+LOCALIDADE = os.environ.get('DRE_LOCALIDADE', 'en')
+if LOCALIDADE not in LOCALIDADES:
+    raise ValueError(f'DRE_LOCALIDADE invalida: {LOCALIDADE} (use {", ".join(LOCALIDADES)})')
+
+
+def localidade():
+    # Localidade escolhida na sessao, ou a padrao fora do Streamlit
+    return st.session_state.get('localidade', LOCALIDADE)
+
+
+def titulo_coluna(nome):
+    # Titulo de grafico a partir do nome da coluna, ex: 'taxa_cartao' -> 'Taxa Cartao'
+    return nome.replace('_', ' ').replace('+', ' ').title()
+
+
+def nomes_limpos(frames, dataframe, entradas):
+    '''
+    Funcao retorna os nomes limpos (ex: 8_4_1_salarios) das contas selecionadas que continuam no dataframe apos remover as zeradas.
+    input: frames da selecao, dataframe e lista declarativa de contas (ver PlanoContas.seleciona)
+    output: lista de colunas
+    '''
+    plano = frames.plano
+    return [plano.limpo[conta] for conta in plano.seleciona(entradas) if plano.limpo[conta] in dataframe.columns]
+
+
+def _exibe(funcao, objeto, **kwargs):
+    # Envio de tabelas e graficos ao navegador medido como etapa, com o tamanho do payload
+    with medicao.mede(f'st.{funcao.__name__}') as registro:
+        funcao(objeto, **kwargs)
+    # O tamanho e calculado fora do tempo medido (so com a medicao ativa)
+    if registro is not None:
+        registro['payload_bytes'] += medicao.tamanho_payload(objeto)
+
+
+# ---------------- Blocos ----------------
+# Cada bloco e uma dataclass com renderiza(frames); os dataframes vem do cache da selecao.
+# prepara(frames) calcula sem Streamlit o que o bloco guarda no cache da selecao (ver dre.instantaneos)
+
+class Grafico:
+    '''Base dos blocos de grafico: monta(frames) retorna a lista de figuras, guardada no cache da selecao.'''
+
+    def prepara(self, frames):
+        frames.figuras(self)
+
+    def renderiza(self, frames):
+        for figura in frames.figuras(self):
+            _exibe(st.plotly_chart, figura, use_container_width=True)
+
+
+@dataclass
+class Texto:
+    texto: str
+    markdown: bool = True
+
+    def prepara(self, frames):
+        pass
+
+    def renderiza(self, frames):
+        if self.markdown:
+            st.markdown(self.texto)
+        else:
+            st.write(self.texto)
+
+
+@dataclass
+class Tabela:
+    '''
+    Tabela do frame. Acima de limite_colunas so a pagina visivel de colunas vai para o navegador,
+    com filtro de contas e ordenacao feitos no servidor e a janela em Arrow guardada no cache da selecao.
+    '''
+    frame: str
+    indice: str = None
+    limite_colunas: int = 40
+    tamanho: int = COLUNAS_POR_PAGINA
+
+    def prepara(self, frames):
+        frames[self.frame]
+
+    def renderiza(self, frames):
+        df = frames[self.frame]
+        if df.shape[1] <= self.limite_colunas:
+            _exibe(st.dataframe, df if self.indice is None else df.set_index(self.indice), use_container_width=True)
+            return
+
+        chave = f'tabela_{self.frame}'
+        filtro_col, ordena_col, pagina_col, opcoes_col = st.columns([3, 3, 2, 2])
+        filtro = filtro_col.text_input('Filtrar contas', key=f'{chave}_filtro')
+        percentuais = opcoes_col.checkbox('Mostrar perc_', value=True, key=f'{chave}_perc')
+        decrescente = opcoes_col.checkbox('Decrescente', key=f'{chave}_desc')
+        colunas = [c for c in df.columns if c != self.indice]
+        ordena = ordena_col.selectbox('Ordenar por', [self.indice or '(original)'] + colunas, key=f'{chave}_ordena')
+        ordena = None if ordena in (self.indice, '(original)') else ordena
+
+        # Total de colunas filtradas vem junto com a primeira pagina
+        _, total = frames.janela(self.frame, self.indice, filtro, ordena, decrescente, percentuais, 0, self.tamanho)
+        paginas = [f'{inicio + 1}-{min(inicio + self.tamanho, total)}' for inicio in range(0, total, self.tamanho)] or ['0-0']
+        rotulo = pagina_col.selectbox(f'Colunas ({total})', paginas, key=f'{chave}_pagina')
+        visivel, _ = frames.janela(self.frame, self.indice, filtro, ordena, decrescente, percentuais, paginas.index(rotulo), self.tamanho)
+        _exibe(st.dataframe, visivel, use_container_width=True)
+
+
+@dataclass
+class Total:
+    '''Consolidado de uma conta nos meses selecionados.'''
+    rotulo: str
+    conta: str
+
+    def prepara(self, frames):
+        frames.totais()
+
+    def renderiza(self, frames):
+        st.markdown(f"#### {self.rotulo}:\t\t{formata_numero(frames.totais()[frames.plano.conta(self.conta)], localidade=localidade())}")
+
+
+@dataclass
+class Medidas:
+    '''Colunas com o total de cada conta e o percentual sobre a ROB.'''
+    titulos: list
+    contas: list
+    titulo: str = None
+    separador: bool = True
+
+    def prepara(self, frames):
+        frames.kpis(self.contas)
+
+    def renderiza(self, frames):
+        kpis = frames.kpis(self.contas)
+        # Todos os cards do bloco formatados de uma vez
+        valores = formata(kpis['Total'], localidade=localidade())
+        percentuais = formata(kpis['Perc_ROB'], percentual=True, localidade=localidade())
+        with st.container():
+            if self.titulo is not None:
+                st.markdown(self.titulo)
+            for titulo, valor, percentual, col in zip(self.titulos, valores, percentuais, st.columns(len(self.titulos))):
+                with col:
+                    st.markdown(f'###### {titulo}')
+                    st.markdown(f"#### {valor}")
+                    st.markdown(f"##### :green[{percentual}]")
+            if self.separador:
+                st.write('---')
+
+
+@dataclass
+class Participacoes:
+    '''Total de cada loja e participacao na soma das lojas; so aparece com o Consolidado selecionado.'''
+    titulos: list
+    contas: list
+    titulo: str = None
+
+    def prepara(self, frames):
+        frames.participacoes(self.contas)
+
+    def renderiza(self, frames):
+        participacoes = frames.participacoes(self.contas)
+        if participacoes.empty:
+            return
+        nomes = dict(zip(frames.plano.seleciona(self.contas), self.titulos))
+        nomes.update({f'perc_{conta}': f'% {titulo}' for conta, titulo in nomes.items()})
+        if self.titulo is not None:
+            st.markdown(self.titulo)
+        tabela = participacoes.rename(columns=nomes)
+        _exibe(st.dataframe, estilo(tabela, localidade=localidade(), percentuais=[f'% {t}' for t in self.titulos]), use_container_width=True)
+        st.write('---')
+
+
+@dataclass
+class Metricas:
+    '''Metricas da conta principal e, dentro de um expander, de todas as contas do frame.'''
+    frame: str
+    conta: str
+
+    def prepara(self, frames):
+        frames.metricas(self.frame)
+
+    def renderiza(self, frames):
+        metricas = frames.metricas(self.frame)
+        _exibe(st.write, estilo(metricas.loc[[self.conta]], localidade=localidade(), percentuais=[]))
+        with st.expander('Metricas de todas as contas'):
+            _exibe(st.dataframe, estilo(metricas, localidade=localidade(), percentuais=[]), use_container_width=True)
+
+
+@dataclass
+class Variacoes:
+    '''
+    Maiores variacoes (contas analiticas) de cada grupo de contas na comparacao escolhida: mes anterior (MoM),
+    mesmo periodo do ano anterior (YoY) ou orcamento, e a tabela de variacoes de todas as contas.
+    grupos = {titulo: lista declarativa de contas}.
+    '''
+    grupos: dict
+    quantidade: int = 10
+
+    def prepara(self, frames):
+        # Depende de outros periodos e do orcamento, que nao entram na assinatura do instantaneo: sempre calculado na hora
+        pass
+
+    def renderiza(self, frames):
+        comparacoes = [c for c in COMPARACOES if c != 'Orcamento' or frames.orcamento is not None]
+        comparacao = st.radio('Comparar com', comparacoes, horizontal=True, key='variacoes_comparacao')
+        for titulo, contas in self.grupos.items():
+            st.markdown(f'##### {titulo}')
+            _exibe(st.dataframe, estilo(frames.maiores_variacoes(contas, comparacao, self.quantidade), localidade=localidade()), use_container_width=True)
+        with st.expander('Variacoes de todas as contas'):
+            _exibe(st.dataframe, estilo(frames.variacoes(), localidade=localidade()), use_container_width=True)
+
+
+@dataclass
+class Pizza(Grafico):
+    '''Rosca com o total das contas (codigo ou nome) nos meses selecionados.'''
+    contas: list
+    nomes: list
+    furo: float = 0.5
+
+    def monta(self, frames):
+        totais = frames.totais()
+        valores = [totais[frames.plano.conta(conta)] for conta in self.contas]
+        return [graficos.pizza(valores, self.nomes, furo=self.furo)]
+
+
+@dataclass
+class Linhas(Grafico):
+    frame: str
+    x: str
+    y: list
+    titulo: str = None
+    labels: dict = None
+    legenda: str = None
+    mostra_legenda: bool = True
+
+    def monta(self, frames):
+        return [graficos.linhas(frames[self.frame], self.x, self.y, titulo=self.titulo, labels=self.labels,
+                                legenda=self.legenda, mostra_legenda=self.mostra_legenda)]
+
+
+@dataclass
+class Barras(Grafico):
+    frame: str
+    x: str
+    y: list
+    labels: dict = None
+
+    def monta(self, frames):
+        return [graficos.barras(frames[self.frame], self.x, self.y, labels=self.labels)]
+
+
+@dataclass
+class Grade(Grafico):
+    '''Grade de subplots, um por coluna, com os titulos gerados a partir do nome das colunas.'''
+    frame: str
+    x: str
+    colunas: list
+    linhas_grade: int
+    colunas_grade: int
+    titulo: str
+    altura: int
+    largura: int
+    absoluto: bool = False
+
+    def monta(self, frames):
+        return [graficos.grade(frames[self.frame], self.x, self.colunas, [titulo_coluna(c) for c in self.colunas], self.linhas_grade,
+                               self.colunas_grade, self.titulo, self.altura, self.largura, absoluto=self.absoluto)]
+
+
+@dataclass
+class LinhaMedia(Grafico):
+    '''Linha da coluna y com hover de percentual e a linha tracejada da media da conta media (padrao: a propria y).'''
+    frame: str
+    x: str
+    y: str
+    titulo_y: str
+    media: str = None
+
+    def monta(self, frames):
+        media = frames.metricas(self.frame).loc[self.media or self.y, 'Media']
+        return [graficos.linha_media(frames[self.frame], self.x, self.y, f'perc_{self.y}', media, self.titulo_y)]
+
+
+@dataclass
+class LinhasGrupos(Grafico):
+    '''
+    Um grafico de linhas paralelas por grupo de contas (lista declarativa, ver PlanoContas.seleciona),
+    so com as contas que nao foram zeradas (grupo com todas zeradas fica sem grafico).
+    O titulo vem da primeira conta declarada no grupo, mesmo que ela tenha sido zerada.
+    '''
+    frame: str
+    grupos: list
+    x: str = 'mes'
+
+    def monta(self, frames):
+        df = frames[self.frame]
+        figuras = []
+        for grupo in self.grupos:
+            colunas = nomes_limpos(frames, df, grupo)
+            if not colunas:
+                continue
+            titulo = re.sub(r'[0-9]', '', frames.plano.limpo[frames.plano.seleciona(grupo)[0]]).replace('_', ' ').replace('+', ' ').title()
+            figuras.append(graficos.linhas(df, self.x, colunas, titulo=titulo, labels={'value': 'Valores', self.x: ''}, legenda="Despesas/Taxas"))
+        return figuras
+
+
+@dataclass
+class Detalhe(Grafico):
+    '''Cascata dos filhos de uma conta ate o total dela (um nivel da Cascata).'''
+    conta: str
+
+    def monta(self, frames):
+        etapas = frames.cascata(self.conta)
+        return [graficos.cascata(etapas['conta'], etapas['valor'], etapas['medida'], titulo=self.conta)]
+
+
+@dataclass
+class Cascata(Grafico):
+    '''
+    Cascata de ROB ate o Resultado Gerencial do Periodo pelas linhas de resultado, com detalhamento sob demanda:
+    cada etapa escolhida abre a cascata dos filhos dela, e so os niveis abertos sao montados.
+    '''
+    titulo: str = None
+
+    def monta(self, frames):
+        etapas = frames.cascata()
+        return [graficos.cascata(etapas['conta'], etapas['valor'], etapas['medida'], titulo=self.titulo)]
+
+    def renderiza(self, frames):
+        super().renderiza(frames)
+        conta = None
+        while True:
+            etapas = frames.cascata(conta)
+            abertas = [etapa for etapa in etapas['conta'] if etapa != conta and frames.plano.filhos.get(etapa)]
+            if not abertas:
+                return
+            # A chave inclui a conta do nivel acima: trocar um nivel fecha os de baixo
+            escolha = st.selectbox('Detalhar etapa', ['(nenhuma)'] + abertas, key=f'cascata_{conta}')
+            if escolha == '(nenhuma)':
+                return
+            conta = escolha
+            Detalhe(conta).renderiza(frames)
+
+
+BLOCOS = {bloco.__name__: bloco for bloco in (Texto, Tabela, Total, Medidas, Participacoes, Metricas, Variacoes, Pizza, Linhas, Barras, Grade, LinhaMedia,
+                                              LinhasGrupos, Detalhe, Cascata)}
+
+
+@dataclass
+class Secao:
+    '''Aba do painel: sequencia de blocos e, opcionalmente, os frames proprios da secao ({nome: Quadro}).'''
+    blocos: list
+    quadros: dict = field(default_factory=dict)
+
+
+def renderiza(secao, frames, nome='secao'):
+    '''
+    Funcao executa a secao: registra os frames proprios e renderiza os blocos em ordem.
+    Com a medicao ativa, cada bloco e suas etapas sao registrados com o nome da secao.
+    input: Secao, frames da selecao e nome da secao (aba)
+    output: None
+    '''
+    for nome_quadro, quadro in secao.quadros.items():
+        registra_quadro(nome_quadro, quadro)
+    with medicao.secao(nome):
+        for bloco in secao.blocos:
+            with medicao.mede(f'bloco:{type(bloco).__name__}'):
+                bloco.renderiza(frames)
+
+
+def prepara(secao, frames):
+    '''
+    Funcao calcula, sem Streamlit, tudo o que a secao guarda no cache da selecao: frames, KPIs, metricas e figuras.
+    input: Secao e frames da selecao
+    output: None
+    '''
+    for nome_quadro, quadro in secao.quadros.items():
+        registra_quadro(nome_quadro, quadro)
+    for bloco in secao.blocos:
+        bloco.prepara(frames)
+
+
+def secao_de_dict(dicionario):
+    '''
+    Funcao monta uma Secao a partir de um dicionario (ex: lido de JSON).
+    Blocos no formato {"tipo": "Linhas", "frame": ..., ...} e quadros com os campos de Quadro.
+    input: dicionario com 'blocos' e opcionalmente 'quadros'
+    output: Secao
+    '''
+    blocos = [BLOCOS[bloco['tipo']](**{k: v for k, v in bloco.items() if k != 'tipo'}) for bloco in dicionario['blocos']]
+    quadros = {nome: Quadro(**quadro) for nome, quadro in dicionario.get('quadros', {}).items()}
+    return Secao(blocos, quadros)
+
+
+def carrega_secoes(caminho):
+    '''
+    Funcao le secoes customizadas de um arquivo JSON {"Nome da aba": {"quadros": {...}, "blocos": [...]}}.
+    input: caminho do JSON
+    output: dicionario {nome da aba: Secao}
+    '''
+    with open(caminho, encoding='utf-8') as arquivo:
+        return {nome: secao_de_dict(secao) for nome, secao in json.load(arquivo).items()}
+
+
+# ---------------- Secoes da DRE ----------------
+
+_LABELS_MES = {'Mes': '', 'value': 'Valores'}
+_DESPESAS_MC2 = ['Comis_vendas', 'taxa_cartao', 'taxa_franq', 'esforco_mark', 'midia_reg', 'midia_loc', 'amostras', 'flaconetes', 'eventos', 'brindes']
+
+SECOES = {
+    'Principais': Secao([
+        Texto("### Principais Indicadores"),
+        Tabela('df_perc', 'Mes'),
+        Texto('---', markdown=False),
+        Total('Consolidado Receita Operacional Bruta (ROB)', 'Receita Operacional Bruta'),
+        Texto('---', markdown=False),
+        Participacoes(['ROB', 'ROL', 'MC1', 'MC2', 'Ebitda'], ['Receita Operacional Bruta', 'Receita Operacional Liquida', 'Margem de Contribuição 1',
+                                                          'Margem de Contribuição 2', 'Ebitda'], titulo="#### Participacao de cada loja no grupo"),
+        Medidas(['ROL', 'MC1', 'MC2'], ['Receita Operacional Liquida', 'Margem de Contribuição 1', 'Margem de Contribuição 2'],
+                titulo="#### Consolidado anual e respectivos percentuais sobre ROB"),
+        Medidas(['Ebitda', 'Resultado Operacional', 'Resultado Financeiro Líquido'], ['Ebitda', 'Resultado Operacional', '(+/-) Resultado Financeiro Líquido']),
+        Medidas(['Resultado Antes do Imposto', 'Resultado Gerencial do Período'], ['Resultado Antes do Imposto', 'Resultado Gerencial do Período'], separador=False),
+    ]),
+    'ROB': Secao([
+        Texto("#### Receita Operacional Bruta"),
+        Tabela('df_metricas'),
+        Texto("##### Distribuicao do ROB entre VM, PS, e Pacotes"),
+        Pizza(['1.1', '1.2', '1.3'], ['VM', 'PS', 'Pacotes']),
+        Texto("##### Distribuicao Mensal ROB por VM, PS, Pacotes"),
+        Linhas('df_meses_selecionados', 'Mes', ['Receita Operacional Bruta', '1.1 - Vendas de mercadorias', '1.2 - Prestação De Serviços', '1.3 – Pacotes'],
+               labels=_LABELS_MES, mostra_legenda=False),
+    ]),
+    'ROL': Secao([
+        Texto("#### Receita Operacional Liquida"),
+        Tabela('df_rol', 'Mes'),
+        Texto("##### Distribuicao Mensal ROB, Imposto_venda,ROL"),
+        Linhas('df_rol', 'Mes', ['ROB', 'Imposto_venda', 'ROL'], mostra_legenda=False),
+        Barras('df_rol', 'Mes', ['COFINS', 'ICMS', 'ISS', 'Simples', 'devol_vendas', 'desc_abat']),
+    ]),
+    'MCl': Secao([
+        Texto("#### Margem de Contribuicao 1"),
+        Tabela('df_mc1', 'Mes'),
+        Texto("##### Distribuicao Mensal MC1, Imposto_venda,ROL"),
+        Linhas('df_mc1', 'Mes', ['ROB', 'Custo_Vendas', 'MC1'], mostra_legenda=False),
+        Barras('df_mc1', 'Mes', ['Custo_Mercadoria', 'Perdas_Estoque']),
+    ]),
+    'MC2': Secao([
+        Texto("#### Margem de Contribuicao 2"),
+        Tabela('df_mc2', 'Mes'),
+        Texto("##### Distribuicao Mensal, Outros, Esforco Marketing, Embalagem, MC2"),
+        Linhas('df_mc2', 'Mes', ['ROB', 'Outros', 'esforco_mark_prom', 'embalagem', 'MC2'], labels={'value': 'Valores', 'Mes': ''}, mostra_legenda=False),
+        Barras('df_mc2', 'Mes', _DESPESAS_MC2, labels={'value': 'Valores', 'Mes': ''}),
+        Grade('df_mc2', 'Mes', _DESPESAS_MC2, 5, 2, "DESPESAS COMPONENTES DE MC2 ", 800, 1200, absoluto=True),
+    ]),
+    'EBITDA': Secao([
+        Texto('##### Ebitda: (MC2 - Despesas Operacionais)'),
+        Tabela('df_ebitda', 'mes'),
+        Metricas('df_ebitda', 'ebitda'),
+        LinhaMedia('df_ebitda', 'mes', 'ebitda', 'Ebitda'),
+        # Despesas que compoem o Ebitda, estruturais, comunicacao, apoio operacional, pessoal (salario, encargos,
+        # beneficios e recisao), ocupacao, veiculos, administrativas, gerais e terceiros
+        LinhasGrupos('df_ebitda', [['Ebitda', ['filhos:8', '8.8.6']], ['grupo:8.1'], ['grupo:8.2'], ['grupo:8.3'], ['8.4', 'grupo:8.4.1'],
+                                   ['grupo:8.4.2'], ['grupo:8.4.3'], ['grupo:8.4.4'], ['grupo:8.5'], ['grupo:8.6'], ['grupo:8.7'], ['grupo:8.8'], ['grupo:8.9']]),
+    ]),
+    'ROP': Secao([
+        Tabela('df_res_op', 'mes'),
+        Metricas('df_res_op', 'resultado_operacional'),
+        # Resultado financeiro liquido e despesas financeiras
+        LinhasGrupos('df_res_op', [['10', 'grupo:10.1'], ['grupo:10.2']]),
+    ]),
+    'RAI': Secao([
+        Tabela('df_rai', 'mes'),
+        Metricas('df_rai', 'resultado_operacional'),
+        Grade('df_rai', 'mes', ['ebitda', 'despesa_com_escritorio', 'resultado_operacional', 'resultado_antes_do_imposto'], 2, 2,
+              "DISTRIBUICAO DA COMPOSICAO DE RESULTADO ANTES DOS IMPOSTOS", 600, 1080),
+    ]),
+    'RGP': Secao([
+        Texto('Resultado Operacional do Periodo', markdown=False),
+        Tabela('df_rgp'),
+        Metricas('df_rgp', 'resultado_antes_do_imposto'),
+        Texto('##### Resultado Gerencial do Periodo'),
+        LinhaMedia('df_rgp', 'mes', 'resultado_gerencial_do_periodo', 'RGP', media='resultado_antes_do_imposto'),
+    ]),
+    # Cascata de ROB ate o RGP com detalhamento de cada etapa (ex: Despesas Operacionais -> 8.4 Pessoal -> 8.4.1 Salarios)
+    'Cascata': Secao([
+        Texto('#### Cascata do resultado'),
+        Cascata(),
+    ]),
+    # Revisao mensal: contas que mais variaram em cada secao, com as mesmas contas dos frames das abas
+    'Variacoes': Secao([
+        Texto('#### Maiores variacoes por secao'),
+        Variacoes({'ROL': QUADROS['df_rol'].contas, 'MC1': QUADROS['df_mc1'].contas, 'MC2': QUADROS['df_mc2'].contas,
+                   'EBITDA': QUADROS['df_ebitda'].contas, 'ROP': QUADROS['df_res_op'].contas}),
+    ]),
+}
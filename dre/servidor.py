@@ -0,0 +1,28 @@
+'''
+Sobe o dashboard com os caches aquecidos: a thread de aquecimento comeca antes do servidor do Streamlit, no mesmo
+processo, entao a carga das planilhas, os frames da selecao inicial e o plotly ficam prontos enquanto o servidor sobe
+e o primeiro usuario depois de um deploy ou reinicio ja encontra tudo em cache.
+
+Uso: python -m dre.servidor [DRE_G_stream_final.py] [opcoes do streamlit run, ex: --server.port 8501]
+'''
+import sys
+
+from dre.aquecimento import aquece
+from dre.base import lista_planilhas
+
+SCRIPT_PADRAO = 'DRE_G_stream_final.py'
+
+
+def main(argv=None):
+    argv = list(sys.argv[1:] if argv is None else argv)
+    script = argv.pop(0) if argv and argv[0].endswith('.py') else SCRIPT_PADRAO
+    aquece(lista_planilhas)
+
+    # Mesmo comando do 'streamlit run', no processo que ja esta aquecendo os caches
+    from streamlit.web import cli
+    sys.argv = ['streamlit', 'run', script, *argv]
+    return cli.main()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
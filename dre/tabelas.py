@@ -0,0 +1,41 @@
+import numpy as np
+
+# Dependencia opcional: sem pyarrow a janela segue como dataframe e o Streamlit faz a conversao
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+COLUNAS_POR_PAGINA = 25
+
+
+def colunas_filtradas(dataframe, filtro='', percentuais=True):
+    '''
+    Funcao retorna as colunas que passam no filtro (texto contido no nome, sem diferenciar maiusculas) e, opcionalmente, sem as perc_.
+    input: dataframe, texto do filtro e percentuais (False remove as colunas perc_)
+    output: pd.Index com as colunas
+    '''
+    colunas = dataframe.columns
+    nomes = colunas.astype(str)
+    manter = np.ones(len(colunas), dtype=bool)
+    if not percentuais:
+        manter &= ~np.asarray(nomes.str.startswith('perc_'), dtype=bool)
+    if filtro:
+        manter &= np.asarray(nomes.str.contains(filtro, case=False, regex=False), dtype=bool)
+    return colunas[manter]
+
+
+def janela(dataframe, indice=None, filtro='', ordena=None, decrescente=False, percentuais=True, pagina=0, tamanho=COLUNAS_POR_PAGINA):
+    '''
+    Funcao recorta a janela visivel de uma tabela larga: filtra e ordena no servidor e devolve so uma pagina de colunas.
+    A ordenacao das linhas usa a tabela inteira, entao a coluna ordenada nao precisa estar na pagina.
+    input: dataframe, coluna usada como indice, filtro, coluna de ordenacao, decrescente, percentuais, pagina (0 = primeira) e colunas por pagina
+    output: tupla (janela em Arrow, ou dataframe sem pyarrow, e total de colunas filtradas)
+    '''
+    if indice is not None:
+        dataframe = dataframe.set_index(indice)
+    colunas = colunas_filtradas(dataframe, filtro, percentuais)
+    if ordena is not None:
+        dataframe = dataframe.sort_values(ordena, ascending=not decrescente, kind='stable')
+    visivel = dataframe[colunas[pagina * tamanho:(pagina + 1) * tamanho]]
+    return (visivel if pa is None else pa.Table.from_pandas(visivel)), len(colunas)
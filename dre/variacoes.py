@@ -0,0 +1,99 @@
+'''
+Analise de variacoes da DRE: ultimo mes selecionado contra o mes anterior (MoM), selecao contra os mesmos meses do ano
+anterior (YoY) e realizado contra orcado, para todas as contas e varias entidades de uma vez. Os totais saem dos cubos
+de somas acumuladas (uma subtracao por trecho continuo de meses para todas as entidades) e as variacoes sao operacoes
+sobre as matrizes [entidade x conta], sem laco por conta.
+O orcamento e uma base no mesmo layout da DRE_dummy (ver dre.base.carrega_orcamento).
+'''
+import numpy as np
+import pandas as pd
+
+from dre.carga import MESES
+
+# Comparacao -> (coluna comparada, coluna de referencia, variacao, percentual sobre a referencia)
+COMPARACOES = {
+    'MoM': ('Mes', 'Mes_anterior', 'Var_MoM', 'perc_MoM'),
+    'YoY': ('Realizado', 'Ano_anterior', 'Var_YoY', 'perc_YoY'),
+    'Orcamento': ('Realizado', 'Orcado', 'Var_Orc', 'perc_Orc'),
+}
+MEDIDAS = ['Realizado', 'Mes', 'Mes_anterior', 'Var_MoM', 'perc_MoM', 'Ano_anterior', 'Var_YoY', 'perc_YoY', 'Orcado', 'Var_Orc', 'perc_Orc']
+
+
+def mes_anterior(ano, mes):
+    # Ano e mes anteriores ao mes (Jan -> Dez do ano anterior)
+    posicao = MESES.index(mes)
+    return (ano, MESES[posicao - 1]) if posicao else (ano - 1, MESES[-1])
+
+
+def periodos_referencia(ano, meses):
+    '''
+    Funcao retorna os periodos com que a selecao e comparada.
+    input: ano e lista de meses
+    output: dicionario {coluna de referencia: (ano, lista de meses)}; sem meses, so o ano anterior
+    '''
+    referencias = {'Ano_anterior': (ano - 1, list(meses))}
+    if meses:
+        ultimo = max(meses, key=MESES.index)
+        ano_mes, mes = mes_anterior(ano, ultimo)
+        referencias.update({'Mes': (ano, [ultimo]), 'Mes_anterior': (ano_mes, [mes])})
+    return referencias
+
+
+def totais_periodo(base, entidades, ano, meses, contas):
+    '''
+    Funcao retorna o total das contas de varias entidades nos meses, alinhado ao plano pedido.
+    Entidade sem todos os meses no ano (ou sem o ano) fica com NaN, para nao comparar com um periodo incompleto.
+    input: BaseDRE, lista de entidades, ano, lista de meses e indice de contas
+    output: array float [entidade x conta]
+    '''
+    totais = np.full((len(entidades), len(contas)), np.nan)
+    completas = [i for i, entidade in enumerate(entidades) if meses and set(meses) <= set(base.meses(entidade, ano))]
+    if completas:
+        tabela = base.cubo.totais_entidades([entidades[i] for i in completas], ano, meses)
+        totais[completas] = tabela.reindex(columns=contas).to_numpy(dtype='float64')
+    return totais
+
+
+def calcula_variacoes(base, entidades, ano, meses, orcamento=None):
+    '''
+    Funcao calcula realizado, referencias, variacoes e percentuais de todas as contas das entidades na selecao.
+    Percentual = variacao / |referencia| (vazio quando a referencia e zero ou nao existe).
+    input: BaseDRE, lista de entidades, ano, lista de meses e BaseDRE do orcamento (None = sem orcamento)
+    output: dicionario {medida (MEDIDAS): array float [entidade x conta]}
+    '''
+    contas = base.armazem.contas
+    vazio = np.full((len(entidades), len(contas)), np.nan)
+    medidas = {'Realizado': totais_periodo(base, entidades, ano, meses, contas), 'Mes': vazio, 'Mes_anterior': vazio}
+    for coluna, (ano_referencia, meses_referencia) in periodos_referencia(ano, meses).items():
+        medidas[coluna] = totais_periodo(base, entidades, ano_referencia, meses_referencia, contas)
+    medidas['Orcado'] = vazio if orcamento is None else totais_periodo(orcamento, entidades, ano, meses, contas)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for comparada, referencia, variacao, percentual in COMPARACOES.values():
+            medidas[variacao] = medidas[comparada] - medidas[referencia]
+            medidas[percentual] = medidas[variacao] / np.abs(medidas[referencia])
+            medidas[percentual][~np.isfinite(medidas[percentual])] = np.nan
+    return {medida: medidas[medida] for medida in MEDIDAS}
+
+
+def variacoes_entidade(base, entidade, ano, meses, orcamento=None):
+    '''
+    Funcao retorna as variacoes de todas as contas de uma entidade na selecao.
+    input: BaseDRE, entidade, ano, lista de meses e BaseDRE do orcamento (None = sem orcamento)
+    output: dataframe indexado pela conta com as colunas MEDIDAS
+    '''
+    medidas = calcula_variacoes(base, [entidade], ano, meses, orcamento)
+    return pd.DataFrame({medida: valores[0] for medida, valores in medidas.items()}, index=base.armazem.contas)
+
+
+def maiores_variacoes(variacoes, plano, contas, comparacao, quantidade=10):
+    '''
+    Funcao ordena as contas analiticas (com codigo e sem filhos) pela maior variacao absoluta na comparacao.
+    input: dataframe de variacoes da selecao, PlanoContas, lista declarativa de contas (ver PlanoContas.seleciona),
+           comparacao (chave de COMPARACOES) e quantidade de contas
+    output: dataframe com a coluna comparada, a referencia, a variacao e o percentual das contas com variacao
+    '''
+    colunas = list(COMPARACOES[comparacao])
+    analiticas = [conta for conta in plano.seleciona(contas) if plano.codigo.get(conta) and not plano.filhos[conta] and conta in variacoes.index]
+    tabela = variacoes.loc[analiticas, colunas]
+    return tabela.loc[tabela[colunas[2]].abs().nlargest(quantidade).index]